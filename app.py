@@ -3,8 +3,8 @@ import os
 import logging
 from flask import Flask
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging (LOG_LEVEL=DEBUG para diagnóstico)
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
 
 # Create Flask app
 app = Flask(__name__)
@@ -15,12 +15,22 @@ UPLOAD_FOLDER = 'uploads'
 app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
 app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 
+# Configure storage backend: 'json' (data/motoristas.json) or 'sql'
+# (SQLite em data/motoristas.db, ou Postgres via DATABASE_URL)
+app.config['STORAGE_BACKEND'] = os.environ.get('STORAGE_BACKEND', 'json')
+
 # Create upload directory if it doesn't exist
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 os.makedirs('data', exist_ok=True)
 
+# Medir duração das requisições (métricas em /metrics)
+from metricas import instrumentar
+instrumentar(app)
+
 # Import routes
 from routes import *
+import comandos
 
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    from main import servir
+    servir()
@@ -0,0 +1,177 @@
+import os
+import time
+import hashlib
+import tempfile
+import threading
+from werkzeug.security import safe_join
+from app import app
+from repositorio import trava_arquivo
+from miniaturas import TAMANHOS, caminho_miniatura, eh_miniatura
+
+TAMANHO_BLOCO = 1024 * 1024
+
+# Blobs sem referência mais novos que isso (segundos) não são apagados: podem
+# ter sido gravados por um upload cujo motorista ainda não foi salvo
+CARENCIA = 10 * 60
+
+
+def pasta_blobs():
+    return os.path.join(app.config['UPLOAD_FOLDER'], '_blobs')
+
+
+def trava_blobs():
+    """Trava entre processos de reaproveitar (upload) e apagar (coleta) blobs"""
+    return trava_arquivo(os.path.join(pasta_blobs(), 'blobs'))
+
+
+def caminho_blob(chave):
+    """Caminho do blob: uploads/_blobs/<2 primeiros caracteres>/<sha256>.<ext>"""
+    return os.path.join(pasta_blobs(), chave[:2], chave)
+
+
+def versao_blob(caminho):
+    """Hash do conteúdo, se o caminho for de um blob (o nome é o próprio hash)"""
+    pasta = os.path.dirname(os.path.dirname(os.path.abspath(caminho)))
+    if pasta != os.path.abspath(pasta_blobs()):
+        return None
+    return os.path.basename(caminho).split('.', 1)[0]
+
+
+def salvar_blob(arquivo, extensao):
+    """Gravar o conteúdo de `arquivo` (FileStorage ou arquivo binário) como blob.
+
+    O SHA-256 é calculado enquanto o conteúdo é copiado para um temporário,
+    que é renomeado para o nome definitivo; se o blob já existir, o
+    temporário é descartado. Retorna a chave '<sha256>.<ext>'.
+    """
+    os.makedirs(pasta_blobs(), exist_ok=True)
+    origem = getattr(arquivo, 'stream', arquivo)
+    sha256 = hashlib.sha256()
+    fd, temporario = tempfile.mkstemp(dir=pasta_blobs(), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            while True:
+                bloco = origem.read(TAMANHO_BLOCO)
+                if not bloco:
+                    break
+                sha256.update(bloco)
+                f.write(bloco)
+        chave = f"{sha256.hexdigest()}.{extensao}"
+        destino = caminho_blob(chave)
+        # Sob a trava: a coleta não apaga o blob entre conferir e renovar
+        with trava_blobs():
+            if os.path.exists(destino):
+                # Renova a carência: o blob vai ganhar uma referência
+                os.utime(destino)
+            else:
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                os.replace(temporario, destino)
+    finally:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+    return chave
+
+
+def resolver(motorista, referencia):
+    """Caminho do arquivo `referencia` (relativo a uploads/<id>) do motorista.
+
+    Arquivos enviados pelo repositório de blobs constam em `motorista['blobs']`;
+    os demais continuam no caminho antigo dentro da pasta do motorista.
+    """
+    chave = motorista.get('blobs', {}).get(referencia)
+    if chave:
+        return caminho_blob(chave)
+    return safe_join(os.path.join(app.config['UPLOAD_FOLDER'], motorista['id']), referencia)
+
+
+class ContagemReferencias:
+    """Quantas referências de motoristas cada blob tem.
+
+    Assina o repositório como os índices: é atualizada a cada motorista
+    gravado ou removido, sem percorrer o cadastro.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._contagem = {}
+
+    def _somar(self, motorista, delta):
+        for chave in motorista.get('blobs', {}).values():
+            total = self._contagem.get(chave, 0) + delta
+            if total > 0:
+                self._contagem[chave] = total
+            else:
+                self._contagem.pop(chave, None)
+
+    def recarregar(self, motoristas):
+        with self._lock:
+            self._contagem = {}
+            for motorista in motoristas:
+                self._somar(motorista, 1)
+
+    def aplicar(self, anterior, novo):
+        with self._lock:
+            if anterior is not None:
+                self._somar(anterior, -1)
+            if novo is not None:
+                self._somar(novo, 1)
+
+    def referencias(self, chave):
+        with self._lock:
+            return self._contagem.get(chave, 0)
+
+
+def _remover_blob(caminho):
+    for tamanho in TAMANHOS:
+        miniatura = caminho_miniatura(caminho, tamanho)
+        if os.path.exists(miniatura):
+            os.remove(miniatura)
+    os.remove(caminho)
+    try:
+        os.rmdir(os.path.dirname(caminho))
+    except OSError:
+        pass  # Ainda há outros blobs com o mesmo prefixo
+
+
+def remover_orfaos(chaves, contagem, carencia=CARENCIA):
+    """Apagar os blobs de `chaves` que ficaram sem referência; retorna quantos"""
+    removidos = 0
+    limite = time.time() - carencia
+
+    def orfao(chave, caminho):
+        return not contagem.referencias(chave) and os.path.getmtime(caminho) <= limite
+
+    for chave in set(chaves):
+        caminho = caminho_blob(chave)
+        try:
+            if not orfao(chave, caminho):
+                continue
+            # Confere de novo sob a trava: um upload do mesmo conteúdo pode
+            # ter acabado de reaproveitar o blob (salvar_blob)
+            with trava_blobs():
+                if not orfao(chave, caminho):
+                    continue
+                _remover_blob(caminho)
+            removidos += 1
+        except FileNotFoundError:
+            continue
+    return removidos
+
+
+def coletar_orfaos(contagem, carencia=CARENCIA, protegidas=()):
+    """Apagar todos os blobs sem referência e temporários abandonados.
+
+    `protegidas` são chaves ainda sem referência que devem ser mantidas.
+    """
+    if not os.path.isdir(pasta_blobs()):
+        return 0
+    limite = time.time() - carencia
+    chaves = []
+    for nome in os.listdir(pasta_blobs()):
+        caminho = os.path.join(pasta_blobs(), nome)
+        if nome.endswith('.tmp'):
+            if os.path.getmtime(caminho) <= limite:
+                os.remove(caminho)
+        elif os.path.isdir(caminho) and len(nome) == 2:
+            chaves.extend(n for n in os.listdir(caminho) if not eh_miniatura(n) and n not in protegidas)
+    return remover_orfaos(chaves, contagem, carencia)
@@ -0,0 +1,214 @@
+import os
+import json
+import threading
+from datetime import datetime, timedelta
+from flask import render_template
+from app import app
+from repositorio import trava_arquivo, gravar_atomico
+from vencimentos import parse_data
+
+# Dias de antecedência em que um vencimento entra no resumo (0 = venceu)
+LIMIARES = (30, 15, 7, 0)
+
+# Documentos vencidos há mais dias que isso deixam de ser acompanhados
+RETENCAO = 30
+
+PASTA_SAIDA = 'data/outbox'
+
+NOMES_DOCUMENTOS = {'cnh': 'CNH', 'curso': 'Curso de Passageiros'}
+
+
+def limiar(validade, hoje):
+    """Menor limiar já alcançado pelo documento, ou None se está longe de vencer"""
+    dias = (validade - hoje).days
+    for valor in sorted(LIMIARES):
+        if dias <= valor:
+            return valor
+    return None
+
+
+class Alteracoes:
+    """Motoristas alterados desde o último resumo.
+
+    Assinado no repositório como os índices: `aplicar` anota o ID e
+    `recarregar` (início do processo, compactação por outro worker) marca
+    que tudo pode ter mudado, o que faz o próximo resumo varrer a janela
+    inteira de vencimentos.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._completo = True
+        self._ids = set()
+
+    def recarregar(self, motoristas):
+        with self._lock:
+            self._completo = True
+            self._ids = set()
+
+    def aplicar(self, anterior, novo):
+        with self._lock:
+            self._ids.add((novo or anterior)['id'])
+
+    def retirar(self):
+        """(tudo mudou?, IDs alterados), zerando as anotações"""
+        with self._lock:
+            completo, ids = self._completo, self._ids
+            self._completo, self._ids = False, set()
+        return completo, ids
+
+
+def _caminho_cursor(pasta):
+    return os.path.join(pasta, 'cursor.json')
+
+
+def ler_cursor(pasta=PASTA_SAIDA):
+    """Estado da última execução: {'ultima_execucao', 'avisados'}, ou None"""
+    try:
+        with open(_caminho_cursor(pasta), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _candidatos(indice, alteracoes, ultima, hoje):
+    """(varredura completa?, documentos (data, id, documento) cujo limiar pode
+    ter mudado desde `ultima`, IDs alterados)"""
+    completo, ids = alteracoes.retirar()
+    if completo or ultima is None or ultima >= hoje:
+        return True, indice.entre(hoje - timedelta(days=RETENCAO), hoje + timedelta(days=max(LIMIARES))), ids
+    # Passagem do tempo: só quem cruzou um limiar entre a última execução e hoje
+    candidatos = set()
+    for valor in LIMIARES:
+        candidatos.update(indice.entre(ultima + timedelta(days=valor + 1), hoje + timedelta(days=valor)))
+    # Cadastros alterados: validade nova, motorista removido
+    for id in ids:
+        validades = indice.validades(id)
+        candidatos.update((validade, id, doc) for doc, validade in validades.items())
+    return False, sorted(candidatos), ids
+
+
+def gerar_resumo(indice, alteracoes, obter, hoje, pasta=PASTA_SAIDA, forcar=False):
+    """Resumo dos vencimentos que cruzaram 30/15/7/0 dias desde a última execução.
+
+    Cada documento entra uma vez por limiar (de novo se a validade mudar). O
+    resumo é gravado em JSON e HTML na pasta de saída; retorna o resumo, ou
+    None se já houve execução hoje (sem `forcar`) ou nada a avisar.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    with trava_arquivo(_caminho_cursor(pasta)):
+        cursor = ler_cursor(pasta) or {'ultima_execucao': None, 'avisados': {}}
+        ultima = parse_data(cursor['ultima_execucao'])
+        if ultima == hoje and not forcar:
+            return None
+        completo, candidatos, ids = _candidatos(indice, alteracoes, ultima, hoje)
+        try:
+            avisos, avisados = _avaliar(cursor['avisados'], completo, candidatos, ids, obter, hoje)
+            resumo = None
+            if avisos:
+                resumo = {
+                    'data': hoje.isoformat(),
+                    'gerado_em': datetime.now().isoformat(timespec='seconds'),
+                    'total': len(avisos),
+                    'avisos': avisos
+                }
+                _gravar_resumo(resumo, pasta)
+            gravar_atomico(_caminho_cursor(pasta), lambda f: json.dump(
+                {'ultima_execucao': hoje.isoformat(), 'avisados': avisados}, f, ensure_ascii=False))
+        except BaseException:
+            # As alterações retiradas se perderiam: o próximo resumo varre tudo
+            alteracoes.recarregar(None)
+            raise
+    app.logger.info(f"Resumo de vencimentos de {hoje.isoformat()}: {len(avisos)} avisos "
+                    f"({len(candidatos)} documentos examinados)")
+    return resumo
+
+
+def _avaliar(anteriores, completo, candidatos, ids, obter, hoje):
+    """(avisos novos, documentos avisados atualizados)"""
+    # Varredura da janela inteira: o que não está nela não é mais acompanhado
+    avisados = {} if completo else dict(anteriores)
+
+    examinados = set()
+    avisos = []
+    for validade, id, doc in candidatos:
+        chave = f"{id}|{doc}"
+        examinados.add(chave)
+        valor = limiar(validade, hoje)
+        if valor is None or validade < hoje - timedelta(days=RETENCAO):
+            avisados.pop(chave, None)
+            continue
+        anterior = anteriores.get(chave)
+        avisados[chave] = {'validade': validade.isoformat(), 'limiar': valor}
+        if anterior and anterior['validade'] == validade.isoformat() and anterior['limiar'] <= valor:
+            continue
+        motorista = obter(id)
+        if not motorista:
+            avisados.pop(chave)
+            continue
+        avisos.append({
+            'id': id,
+            'nome': motorista.get('nome'),
+            'cpf': motorista.get('cpf'),
+            'celular': motorista.get('celular'),
+            'documento': doc,
+            'validade': validade.isoformat(),
+            'dias': (validade - hoje).days,
+            'limiar': valor
+        })
+
+    if not completo:
+        for chave in list(avisados):
+            id, doc = chave.split('|')
+            if id in ids and chave not in examinados:
+                # Validade apagada ou motorista removido
+                del avisados[chave]
+            elif parse_data(avisados[chave]['validade']) < hoje - timedelta(days=RETENCAO):
+                del avisados[chave]
+
+    avisos.sort(key=lambda a: (a['limiar'], a['validade'], a['nome'] or ''))
+    return avisos, avisados
+
+
+def _gravar_resumo(resumo, pasta):
+    nome = f"vencimentos_{resumo['data']}_{datetime.now().strftime('%H%M%S')}"
+    gravar_atomico(os.path.join(pasta, f"{nome}.json"),
+                   lambda f: json.dump(resumo, f, indent=2, ensure_ascii=False))
+    with app.app_context():
+        html = render_template('resumo_vencimentos.html', resumo=resumo, documentos=NOMES_DOCUMENTOS,
+                               limiares=sorted(LIMIARES))
+    gravar_atomico(os.path.join(pasta, f"{nome}.html"), lambda f: f.write(html))
+
+
+def ultimo_resumo(pasta=PASTA_SAIDA):
+    """Resumo mais recente gravado na pasta de saída, ou None"""
+    if not os.path.isdir(pasta):
+        return None
+    nomes = sorted(n for n in os.listdir(pasta) if n.startswith('vencimentos_') and n.endswith('.json'))
+    if not nomes:
+        return None
+    with open(os.path.join(pasta, nomes[-1]), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def agendar(executar, hora):
+    """Rodar `executar()` ao iniciar e todo dia às `hora` horas, numa thread.
+
+    Retorna o evento que encerra o agendamento.
+    """
+    def laco():
+        while True:
+            try:
+                executar()
+            except Exception as e:
+                app.logger.error(f"Erro ao gerar o resumo de vencimentos: {str(e)}")
+            agora = datetime.now()
+            proxima = agora.replace(hour=hora, minute=0, second=0, microsecond=0)
+            if proxima <= agora:
+                proxima += timedelta(days=1)
+            if parar.wait((proxima - agora).total_seconds()):
+                return
+
+    parar = threading.Event()
+    threading.Thread(target=laco, name='avisos-vencimento', daemon=True).start()
+    return parar
@@ -0,0 +1,262 @@
+import os
+import io
+import json
+import time
+import queue
+import hashlib
+import tarfile
+import zipfile
+import threading
+from datetime import datetime
+from app import app
+import metricas
+
+PASTA_MANIFESTOS = 'data/backups'
+
+# Formatos já comprimidos vão para o zip sem nova compressão
+EXTENSOES_COMPRIMIDAS = {'.jpg', '.jpeg', '.png', '.gif', '.pdf', '.zip', '.gz'}
+
+FORMATOS = {
+    'zip': ('application/zip', 'zip'),
+    'tar': ('application/gzip', 'tar.gz'),
+}
+
+TAMANHO_BLOCO = 1024 * 1024
+
+
+def listar_arquivos(pasta_uploads):
+    """Arquivos de uploads/ com tamanho e mtime, por nome no backup"""
+    arquivos = {}
+    for raiz, pastas, nomes in os.walk(pasta_uploads):
+        # Envios em blocos ainda não usados não fazem parte dos dados
+        pastas[:] = sorted(p for p in pastas if p != '_envios')
+        for nome in sorted(nomes):
+            if nome.endswith(('.tmp', '.lock')):
+                continue
+            caminho = os.path.join(raiz, nome)
+            try:
+                st = os.stat(caminho)
+            except OSError:
+                continue
+            nome_backup = os.path.relpath(caminho, os.path.dirname(pasta_uploads) or '.').replace(os.sep, '/')
+            arquivos[nome_backup] = {'caminho': caminho, 'tamanho': st.st_size, 'mtime_ns': st.st_mtime_ns}
+    return arquivos
+
+
+def ultimo_manifesto():
+    """Manifesto do último backup concluído, ou None"""
+    if not os.path.isdir(PASTA_MANIFESTOS):
+        return None
+    nomes = sorted(n for n in os.listdir(PASTA_MANIFESTOS) if n.startswith('manifesto_') and n.endswith('.json'))
+    if not nomes:
+        return None
+    with open(os.path.join(PASTA_MANIFESTOS, nomes[-1]), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def salvar_manifesto(manifesto):
+    os.makedirs(PASTA_MANIFESTOS, exist_ok=True)
+    caminho = os.path.join(PASTA_MANIFESTOS, f"manifesto_{manifesto['id']}.json")
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=2, ensure_ascii=False)
+
+
+class _Hash:
+    """Leitor que calcula o SHA-256 do que passa por ele"""
+
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.sha256 = hashlib.sha256()
+
+    def read(self, tamanho=-1):
+        dados = self.arquivo.read(tamanho)
+        self.sha256.update(dados)
+        return dados
+
+
+class _Escritor:
+    """Escreve entradas no zip ou tar.gz de destino, bloco a bloco"""
+
+    def __init__(self, destino, formato):
+        self.formato = formato
+        if formato == 'zip':
+            self.arquivo = zipfile.ZipFile(destino, 'w', zipfile.ZIP_DEFLATED, allowZip64=True)
+        else:
+            self.arquivo = tarfile.open(fileobj=destino, mode='w|gz')
+
+    def adicionar_dados(self, nome, dados):
+        if self.formato == 'zip':
+            info = zipfile.ZipInfo(nome, time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            self.arquivo.writestr(info, dados)
+        else:
+            info = tarfile.TarInfo(nome)
+            info.size = len(dados)
+            info.mtime = int(time.time())
+            self.arquivo.addfile(info, io.BytesIO(dados))
+
+    def adicionar_arquivo(self, nome, caminho):
+        """Adicionar arquivo do disco; retorna o SHA-256 do conteúdo"""
+        with open(caminho, 'rb') as f:
+            leitor = _Hash(f)
+            if self.formato == 'zip':
+                info = zipfile.ZipInfo.from_file(caminho, nome)
+                comprimido = os.path.splitext(nome)[1].lower() in EXTENSOES_COMPRIMIDAS
+                info.compress_type = zipfile.ZIP_STORED if comprimido else zipfile.ZIP_DEFLATED
+                with self.arquivo.open(info, 'w') as saida:
+                    while True:
+                        bloco = leitor.read(TAMANHO_BLOCO)
+                        if not bloco:
+                            break
+                        saida.write(bloco)
+            else:
+                info = self.arquivo.gettarinfo(caminho, nome)
+                self.arquivo.addfile(info, leitor)
+        return leitor.sha256.hexdigest()
+
+    def fechar(self):
+        self.arquivo.close()
+
+
+def escrever_backup(destino, motoristas, pasta_uploads, formato='zip', base=None, progresso=None):
+    """Escrever o backup em `destino` (arquivo aberto para escrita binária).
+
+    Com `base` (manifesto de um backup anterior) o backup é incremental: só
+    entram arquivos novos ou com tamanho/mtime diferentes do manifesto; os
+    demais têm o hash copiado do manifesto e os apagados são listados em
+    `removidos`. `progresso(percentual, mensagem)` é chamado durante a
+    escrita. Retorna o manifesto do estado completo atual.
+    """
+    inicio = time.perf_counter()
+    try:
+        manifesto = _escrever_backup(destino, motoristas, pasta_uploads, formato, base, progresso)
+    except Exception:
+        metricas.backups.inc(1, formato, 'erro')
+        raise
+    metricas.backups.inc(1, formato, 'sucesso')
+    metricas.backup_duracao.observar(time.perf_counter() - inicio, formato, 'sim' if base else 'nao')
+    return manifesto
+
+
+def _escrever_backup(destino, motoristas, pasta_uploads, formato, base, progresso):
+    agora = datetime.now()
+    manifesto = {
+        'id': agora.strftime('%Y%m%d_%H%M%S'),
+        'criado_em': agora.isoformat(),
+        'base': base['id'] if base else None,
+        'arquivos': {},
+        'removidos': []
+    }
+    anteriores = base['arquivos'] if base else {}
+    escritor = _Escritor(destino, formato)
+    escritor.adicionar_dados('motoristas.json', json.dumps(motoristas, indent=2, ensure_ascii=False).encode('utf-8'))
+
+    incluidos = 0
+    arquivos = listar_arquivos(pasta_uploads)
+    for i, (nome, info) in enumerate(arquivos.items()):
+        if progresso and i % 20 == 0:
+            progresso(100 * i // max(len(arquivos), 1), f"{i} de {len(arquivos)} arquivos")
+        anterior = anteriores.get(nome)
+        if anterior and anterior['tamanho'] == info['tamanho'] and anterior['mtime_ns'] == info['mtime_ns']:
+            sha256 = anterior['sha256']
+        else:
+            try:
+                sha256 = escritor.adicionar_arquivo(nome, info['caminho'])
+            except FileNotFoundError:
+                continue
+            incluidos += 1
+        manifesto['arquivos'][nome] = {'tamanho': info['tamanho'], 'mtime_ns': info['mtime_ns'], 'sha256': sha256}
+
+    manifesto['removidos'] = sorted(set(anteriores) - set(manifesto['arquivos']))
+    escritor.adicionar_dados('manifesto.json', json.dumps(manifesto, indent=2).encode('utf-8'))
+    escritor.fechar()
+    app.logger.info(f"Backup {manifesto['id']}: {incluidos} arquivos incluídos de {len(manifesto['arquivos'])}")
+    return manifesto
+
+
+# Quantidade de arquivos de backup gerados em segundo plano mantidos em disco
+BACKUPS_MANTIDOS = 3
+
+
+def criar_backup_arquivo(progresso, nome, motoristas, pasta_uploads, formato='zip', incremental=False):
+    """Gravar o backup em data/backups (tarefa de segundo plano)"""
+    os.makedirs(PASTA_MANIFESTOS, exist_ok=True)
+    caminho = os.path.join(PASTA_MANIFESTOS, nome)
+    base = ultimo_manifesto() if incremental else None
+    try:
+        with open(caminho + '.tmp', 'wb') as f:
+            manifesto = escrever_backup(f, motoristas, pasta_uploads, formato, base, progresso)
+        os.replace(caminho + '.tmp', caminho)
+    finally:
+        if os.path.exists(caminho + '.tmp'):
+            os.remove(caminho + '.tmp')
+    salvar_manifesto(manifesto)
+
+    # Remover arquivos de backup antigos
+    antigos = sorted(
+        (n for n in os.listdir(PASTA_MANIFESTOS) if n.startswith('backup_')),
+        key=lambda n: os.path.getmtime(os.path.join(PASTA_MANIFESTOS, n))
+    )
+    for antigo in antigos[:-BACKUPS_MANTIDOS]:
+        os.remove(os.path.join(PASTA_MANIFESTOS, antigo))
+    return {'arquivo': nome}
+
+
+class _SaidaFila:
+    """Arquivo somente-escrita que entrega os blocos a uma fila"""
+
+    def __init__(self, fila, cancelado):
+        self.fila = fila
+        self.cancelado = cancelado
+        self.buffer = bytearray()
+
+    def write(self, dados):
+        if self.cancelado.is_set():
+            raise IOError('Download do backup cancelado')
+        self.buffer += dados
+        if len(self.buffer) >= TAMANHO_BLOCO:
+            self.flush()
+        return len(dados)
+
+    def flush(self):
+        if self.buffer:
+            self.fila.put(bytes(self.buffer))
+            self.buffer = bytearray()
+
+
+def gerar_backup(motoristas, pasta_uploads, formato='zip', incremental=False):
+    """Gerador com os blocos do backup, produzidos enquanto são enviados.
+
+    O arquivo é montado numa thread que escreve numa fila limitada, sem
+    cópia temporária em disco. O manifesto só é registrado (servindo de base
+    para o próximo incremental) quando o backup chega inteiro ao cliente.
+    """
+    base = ultimo_manifesto() if incremental else None
+    fila = queue.Queue(maxsize=8)
+    cancelado = threading.Event()
+    resultado = {}
+
+    def produzir():
+        saida = _SaidaFila(fila, cancelado)
+        try:
+            resultado['manifesto'] = escrever_backup(saida, motoristas, pasta_uploads, formato, base)
+            saida.flush()
+            fila.put(None)
+        except Exception as e:
+            fila.put(e)
+
+    threading.Thread(target=produzir, daemon=True).start()
+    try:
+        while True:
+            bloco = fila.get()
+            if bloco is None:
+                break
+            if isinstance(bloco, Exception):
+                raise bloco
+            yield bloco
+        salvar_manifesto(resultado['manifesto'])
+    finally:
+        cancelado.set()
+        # Libera a thread produtora caso esteja bloqueada na fila cheia
+        while not fila.empty():
+            fila.get_nowait()
@@ -0,0 +1,224 @@
+"""Benchmarks do cadastro com frotas sintéticas.
+
+Uso (na raiz do projeto):
+
+    python benchmarks/executar.py                       # 1k, 10k e 100k motoristas
+    python benchmarks/executar.py --tamanhos 1000 --repeticoes 50
+    python benchmarks/executar.py --comparar benchmarks/resultados/anterior.json
+
+Cada tamanho roda num processo separado, numa pasta temporária com
+data/motoristas.json e uploads/ gerados por `frota.py`. Para cada operação
+são medidas latências (p50/p99) e o pico de memória alocada (tracemalloc,
+numa execução extra); o resultado é gravado em JSON. Com `--comparar`, as
+medianas são comparadas às de um resultado anterior e o processo termina
+com código 1 se alguma piorou além da tolerância.
+
+A inicialização é medida à parte: `main.py --medir-inicializacao` roda em
+processos novos (`--inicializacoes` vezes) e o tempo de parede inclui a
+partida do interpretador, as importações e a primeira requisição.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+import tracemalloc
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASTA_RESULTADOS = os.path.join(RAIZ, 'benchmarks', 'resultados')
+
+
+def percentil(valores, p):
+    """Percentil pelo método do posto mais próximo"""
+    ordenados = sorted(valores)
+    return ordenados[max(0, min(len(ordenados) - 1, int(round(p / 100 * len(ordenados) + 0.5)) - 1))]
+
+
+def medir(funcao, repeticoes):
+    """Latências (ms) de `repeticoes` chamadas e pico de memória (KB) de uma chamada extra"""
+    funcao()  # Aquecimento: caches, templates e índices
+    latencias = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao()
+        latencias.append((time.perf_counter() - inicio) * 1000)
+    tracemalloc.start()
+    funcao()
+    pico = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return {
+        'n': repeticoes,
+        'p50_ms': round(percentil(latencias, 50), 3),
+        'p99_ms': round(percentil(latencias, 99), 3),
+        'media_ms': round(sum(latencias) / len(latencias), 3),
+        'pico_memoria_kb': round(pico / 1024, 1)
+    }
+
+
+def executar_tamanho(tamanho, repeticoes, com_arquivos):
+    """Roda no processo filho, dentro da pasta temporária já preparada"""
+    sys.path.insert(0, RAIZ)
+    inicio = time.perf_counter()
+    import app as modulo_app
+    import utils
+    carga_ms = (time.perf_counter() - inicio) * 1000
+
+    cliente = modulo_app.app.test_client()
+    aleatorio = random.Random(7)
+    ids = [m['id'] for m in utils.get_motoristas()]
+    nomes = [m['nome'] for m in utils.get_motoristas()[:200]]
+
+    def requisicao(url):
+        def chamar():
+            resposta = cliente.get(url() if callable(url) else url)
+            assert resposta.status_code == 200, resposta.status_code
+            resposta.get_data()
+        return chamar
+
+    def salvar():
+        motorista = utils.get_motorista_by_id(aleatorio.choice(ids))
+        motorista['celular'] = f"(11) 9{aleatorio.randint(1000, 9999)}-{aleatorio.randint(1000, 9999)}"
+        assert utils.save_motorista(motorista)
+
+    operacoes = {
+        'get_motoristas': (utils.get_motoristas, repeticoes),
+        'save_motorista': (salvar, repeticoes),
+        'GET /': (requisicao('/'), repeticoes),
+        'GET /lista': (requisicao('/lista'), repeticoes),
+        'GET /motoristas': (requisicao(lambda: f"/motoristas?pagina={aleatorio.randint(1, 10)}"), repeticoes),
+        'GET /buscar': (requisicao(lambda: f"/buscar?q={aleatorio.choice(nomes).split()[1][:4]}"), repeticoes),
+        'GET /motorista/<id>': (requisicao(lambda: f"/motorista/{aleatorio.choice(ids[:max(com_arquivos, 1)])}"), repeticoes),
+        'GET /backup/download': (requisicao('/backup/download'), max(3, repeticoes // 10)),
+    }
+    resultados = {}
+    for nome, (funcao, n) in operacoes.items():
+        resultados[nome] = medir(funcao, n)
+        print(f"  {nome:<22} p50 {resultados[nome]['p50_ms']:>10.2f} ms   "
+              f"p99 {resultados[nome]['p99_ms']:>10.2f} ms   pico {resultados[nome]['pico_memoria_kb']:>10.1f} KB",
+              file=sys.stderr)
+
+    try:
+        import resource
+        rss_max_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == 'darwin':
+            rss_max_kb //= 1024
+    except ImportError:  # Windows
+        rss_max_kb = None
+    return {'motoristas': tamanho, 'com_arquivos': com_arquivos, 'carga_ms': round(carga_ms, 1),
+            'rss_max_kb': rss_max_kb, 'operacoes': resultados}
+
+
+def medir_inicializacao(pasta, ambiente, vezes):
+    """Tempo de parede (ms) de processos novos até responder à primeira requisição"""
+    comando = [sys.executable, os.path.join(RAIZ, 'main.py'), '--medir-inicializacao']
+    totais, detalhes = [], []
+    for _ in range(vezes):
+        inicio = time.perf_counter()
+        saida = subprocess.run(comando, cwd=pasta, env=ambiente, stdout=subprocess.PIPE, check=True)
+        totais.append((time.perf_counter() - inicio) * 1000)
+        detalhes.append(json.loads(saida.stdout.splitlines()[-1]))
+    resultado = {
+        'n': vezes,
+        'p50_ms': round(percentil(totais, 50), 3),
+        'p99_ms': round(percentil(totais, 99), 3),
+        'media_ms': round(sum(totais) / len(totais), 3),
+        'primeira_ms': round(totais[0], 3),
+        'importacao_p50_ms': percentil([d['importacao_ms'] for d in detalhes], 50),
+        'primeira_requisicao_p50_ms': percentil([d['primeira_requisicao_ms'] for d in detalhes], 50)
+    }
+    print(f"  {'inicializacao':<22} p50 {resultado['p50_ms']:>10.2f} ms   "
+          f"p99 {resultado['p99_ms']:>10.2f} ms   (importação {resultado['importacao_p50_ms']:.0f} ms, "
+          f"1ª requisição {resultado['primeira_requisicao_p50_ms']:.0f} ms)", file=sys.stderr)
+    return resultado
+
+
+def rodar_processo(tamanho, args):
+    """Preparar a frota numa pasta temporária e medir num processo novo"""
+    sys.path.insert(0, os.path.join(RAIZ, 'benchmarks'))
+    from frota import gerar_dados
+    with tempfile.TemporaryDirectory(prefix='bench_esturismo_') as pasta:
+        print(f"Gerando {tamanho} motoristas ({min(args.com_arquivos, tamanho)} com arquivos)...", file=sys.stderr)
+        gerar_dados(pasta, tamanho, min(args.com_arquivos, tamanho))
+        ambiente = dict(os.environ, STORAGE_BACKEND=args.backend, LOG_LEVEL='WARNING')
+        comando = [sys.executable, os.path.abspath(__file__), '--filho', str(tamanho),
+                   '--repeticoes', str(args.repeticoes), '--com-arquivos', str(min(args.com_arquivos, tamanho))]
+        if args.inicializacoes:
+            # Antes das medições, que gravam no cadastro e compactam o diário
+            inicializacao = medir_inicializacao(pasta, ambiente, args.inicializacoes)
+        saida = subprocess.run(comando, cwd=pasta, env=ambiente, stdout=subprocess.PIPE, check=True)
+        resultado = json.loads(saida.stdout)
+        if args.inicializacoes:
+            resultado['operacoes']['inicializacao'] = inicializacao
+        return resultado
+
+
+def comparar(atual, anterior, tolerancia):
+    """Imprimir a variação das medianas; retorna as regressões além da tolerância"""
+    regressoes = []
+    for tamanho, resultado in atual['resultados'].items():
+        base = anterior['resultados'].get(tamanho)
+        if not base:
+            continue
+        print(f"\n{tamanho} motoristas (atual vs. {anterior['data']}):")
+        for operacao, medida in resultado['operacoes'].items():
+            medida_base = base['operacoes'].get(operacao)
+            if not medida_base or not medida_base['p50_ms']:
+                continue
+            razao = medida['p50_ms'] / medida_base['p50_ms']
+            marca = '  <-- REGRESSÃO' if razao > 1 + tolerancia else ''
+            print(f"  {operacao:<22} {medida_base['p50_ms']:>10.2f} -> {medida['p50_ms']:>10.2f} ms ({razao:.2f}x){marca}")
+            if marca:
+                regressoes.append((tamanho, operacao, razao))
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmarks do cadastro de motoristas')
+    parser.add_argument('--tamanhos', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeticoes', type=int, default=30)
+    parser.add_argument('--com-arquivos', type=int, default=200, help='Motoristas com foto, CNH e holerites')
+    parser.add_argument('--inicializacoes', type=int, default=5,
+                        help='Processos novos para medir a inicialização (0 desliga)')
+    parser.add_argument('--backend', choices=['json', 'sql'], default='json')
+    parser.add_argument('--saida', help='Arquivo JSON de resultado (padrão: benchmarks/resultados/<data>.json)')
+    parser.add_argument('--comparar', help='Resultado anterior para comparação')
+    parser.add_argument('--tolerancia', type=float, default=0.25, help='Piora relativa aceita no p50')
+    parser.add_argument('--filho', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.filho:
+        json.dump(executar_tamanho(args.filho, args.repeticoes, args.com_arquivos), sys.stdout)
+        return 0
+
+    resultado = {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'plataforma': platform.platform(),
+        'backend': args.backend,
+        'repeticoes': args.repeticoes,
+        'resultados': {}
+    }
+    for tamanho in args.tamanhos:
+        resultado['resultados'][str(tamanho)] = rodar_processo(tamanho, args)
+
+    saida = args.saida or os.path.join(PASTA_RESULTADOS, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Resultado gravado em {saida}", file=sys.stderr)
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            anterior = json.load(f)
+        if comparar(resultado, anterior, args.tolerancia):
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,107 @@
+"""Gerador de frotas sintéticas para os benchmarks.
+
+Gera motoristas com CPFs válidos (passam em `validate_cpf`), nomes com
+acentos, vencimentos espalhados em torno de hoje e, para parte deles,
+arquivos no repositório de blobs (foto, CNH e holerites).
+"""
+import os
+import json
+import uuid
+import random
+import hashlib
+from datetime import datetime, timedelta
+
+NOMES = ['João', 'José', 'Antônio', 'Francisco', 'Carlos', 'Paulo', 'Pedro', 'Lucas', 'Luíz', 'Marcos',
+         'Maria', 'Ana', 'Francisca', 'Antônia', 'Adriana', 'Juliana', 'Márcia', 'Fernanda', 'Patrícia', 'Aline']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+              'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Araújo', 'Melo', 'Barbosa', 'Conceição', 'Simões', 'Brandão']
+
+
+def gerar_cpf(aleatorio):
+    """CPF válido (11 dígitos, sem máscara)"""
+    while True:
+        digitos = [aleatorio.randint(0, 9) for _ in range(9)]
+        if len(set(digitos)) > 1:
+            break
+    for tamanho in (9, 10):
+        soma = sum(d * (tamanho + 1 - i) for i, d in enumerate(digitos))
+        resto = soma % 11
+        digitos.append(0 if resto < 2 else 11 - resto)
+    return ''.join(map(str, digitos))
+
+
+def gerar_motoristas(quantidade, semente=42):
+    """Lista de motoristas sintéticos com CPFs únicos"""
+    aleatorio = random.Random(semente)
+    hoje = datetime.now()
+    cpfs = set()
+    motoristas = []
+    while len(motoristas) < quantidade:
+        cpf = gerar_cpf(aleatorio)
+        if cpf in cpfs:
+            continue
+        cpfs.add(cpf)
+        nome = ' '.join([aleatorio.choice(NOMES)] + aleatorio.sample(SOBRENOMES, 2))
+        telefone = f"({aleatorio.randint(11, 99)}) 9{aleatorio.randint(1000, 9999)}-{aleatorio.randint(1000, 9999)}"
+        motoristas.append({
+            'id': str(uuid.UUID(int=aleatorio.getrandbits(128), version=4)),
+            'nome': nome,
+            'data_nascimento': (hoje - timedelta(days=aleatorio.randint(21 * 365, 65 * 365))).strftime('%Y-%m-%d'),
+            'cpf': cpf,
+            'celular': telefone,
+            'tipo_vinculo': aleatorio.choice(['registrado', 'freelancer']),
+            'validade_cnh': (hoje + timedelta(days=aleatorio.randint(-120, 5 * 365))).strftime('%Y-%m-%d'),
+            'validade_curso': (hoje + timedelta(days=aleatorio.randint(-120, 5 * 365))).strftime('%Y-%m-%d'),
+            'data_cadastro': (hoje - timedelta(seconds=quantidade - len(motoristas))).isoformat(),
+            'status': 'ativo' if aleatorio.random() < 0.9 else 'inativo',
+            'arquivos': {},
+            'blobs': {},
+            'holerites': []
+        })
+    return motoristas
+
+
+def _gravar_blob(pasta_uploads, conteudo, extensao):
+    chave = f"{hashlib.sha256(conteudo).hexdigest()}.{extensao}"
+    caminho = os.path.join(pasta_uploads, '_blobs', chave[:2], chave)
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    if not os.path.exists(caminho):
+        with open(caminho, 'wb') as f:
+            f.write(conteudo)
+    return chave
+
+
+def gerar_uploads(motoristas, pasta_uploads, quantidade, meses=12, tamanho=32 * 1024, semente=42):
+    """Arquivos falsos para os `quantidade` primeiros motoristas (altera os registros)"""
+    aleatorio = random.Random(semente)
+    hoje = datetime.now()
+    for motorista in motoristas[:quantidade]:
+        id = motorista['id']
+        foto = f"foto_{id}.jpg"
+        motorista['blobs'][foto] = _gravar_blob(pasta_uploads, aleatorio.randbytes(tamanho), 'jpg')
+        motorista['arquivos']['foto'] = foto
+        cnh = f"cnh_{id}.pdf"
+        motorista['blobs'][f"documentos/{cnh}"] = _gravar_blob(pasta_uploads, b'%PDF-1.4\n' + aleatorio.randbytes(tamanho), 'pdf')
+        motorista['arquivos']['cnh'] = cnh
+        for i in range(meses):
+            data = hoje - timedelta(days=30 * i)
+            ano, mes = str(data.year), f"{data.month:02d}"
+            arquivo = f"holerite_{ano}_{mes}.pdf"
+            chave = _gravar_blob(pasta_uploads, b'%PDF-1.4\n' + aleatorio.randbytes(tamanho // 4), 'pdf')
+            motorista['blobs'][f"holerites/{ano}/{mes}/{arquivo}"] = chave
+            motorista['holerites'].append({
+                'ano': ano, 'mes': mes, 'arquivo': arquivo, 'path': f"{ano}/{mes}/{arquivo}",
+                'tamanho': tamanho // 4 + 9, 'enviado_em': data.isoformat(), 'hash': chave.split('.', 1)[0]
+            })
+
+
+def gerar_dados(pasta, quantidade, com_arquivos=0, semente=42):
+    """Criar data/motoristas.json e uploads/ em `pasta`"""
+    motoristas = gerar_motoristas(quantidade, semente)
+    os.makedirs(os.path.join(pasta, 'data'), exist_ok=True)
+    os.makedirs(os.path.join(pasta, 'uploads'), exist_ok=True)
+    if com_arquivos:
+        gerar_uploads(motoristas, os.path.join(pasta, 'uploads'), com_arquivos, semente=semente)
+    with open(os.path.join(pasta, 'data', 'motoristas.json'), 'w', encoding='utf-8') as f:
+        json.dump(motoristas, f, indent=2, ensure_ascii=False)
+    return motoristas
@@ -0,0 +1,153 @@
+import re
+import heapq
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+
+
+def normalizar(texto):
+    """Remover acentos e caixa: 'João' -> 'joao'"""
+    decomposto = unicodedata.normalize('NFKD', texto or '')
+    return ''.join(c for c in decomposto if not unicodedata.combining(c)).casefold()
+
+
+def trigramas(texto):
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceBusca:
+    """Índice de busca por nome e CPF.
+
+    Nomes são quebrados em palavras normalizadas (sem acento e caixa), com
+    lista ordenada para busca por prefixo e trigramas para trechos no meio da
+    palavra; CPFs ficam numa lista ordenada para busca por prefixo. O índice
+    é atualizado a cada motorista gravado ou removido.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._limpar()
+
+    def _limpar(self):
+        self._palavras = {}
+        self._nomes = {}
+        self._cpfs = {}
+        self._por_palavra = {}
+        self._palavras_ordenadas = []
+        self._cpfs_ordenados = []
+        self._por_trigrama = {}
+
+    def _adicionar(self, motorista, ordenar=True):
+        id = motorista['id']
+        nome = normalizar(motorista.get('nome'))
+        palavras = tuple(nome.split())
+        self._nomes[id] = nome
+        self._palavras[id] = palavras
+        for palavra in set(palavras):
+            ids = self._por_palavra.get(palavra)
+            if ids is None:
+                ids = self._por_palavra[palavra] = set()
+                if ordenar:
+                    insort(self._palavras_ordenadas, palavra)
+                else:
+                    self._palavras_ordenadas.append(palavra)
+            ids.add(id)
+            for trigrama in trigramas(palavra):
+                self._por_trigrama.setdefault(trigrama, set()).add(id)
+        cpf = motorista.get('cpf') or ''
+        self._cpfs[id] = cpf
+        if ordenar:
+            insort(self._cpfs_ordenados, (cpf, id))
+        else:
+            self._cpfs_ordenados.append((cpf, id))
+
+    def _remover(self, id):
+        for palavra in set(self._palavras.pop(id, ())):
+            ids = self._por_palavra[palavra]
+            ids.discard(id)
+            if not ids:
+                del self._por_palavra[palavra]
+                del self._palavras_ordenadas[bisect_left(self._palavras_ordenadas, palavra)]
+            for trigrama in trigramas(palavra):
+                ids = self._por_trigrama.get(trigrama)
+                if ids is not None:
+                    ids.discard(id)
+                    if not ids:
+                        del self._por_trigrama[trigrama]
+        self._nomes.pop(id, None)
+        cpf = self._cpfs.pop(id, None)
+        if cpf is not None:
+            i = bisect_left(self._cpfs_ordenados, (cpf, id))
+            if i < len(self._cpfs_ordenados) and self._cpfs_ordenados[i] == (cpf, id):
+                del self._cpfs_ordenados[i]
+
+    def recarregar(self, motoristas):
+        with self._lock:
+            self._limpar()
+            for motorista in motoristas:
+                self._adicionar(motorista, ordenar=False)
+            self._palavras_ordenadas.sort()
+            self._cpfs_ordenados.sort()
+
+    def aplicar(self, anterior, novo):
+        with self._lock:
+            if anterior is not None:
+                self._remover(anterior['id'])
+            if novo is not None:
+                self._adicionar(novo)
+
+    def _por_prefixo(self, termo):
+        ids = set()
+        i = bisect_left(self._palavras_ordenadas, termo)
+        while i < len(self._palavras_ordenadas) and self._palavras_ordenadas[i].startswith(termo):
+            ids |= self._por_palavra[self._palavras_ordenadas[i]]
+            i += 1
+        return ids
+
+    def _por_trecho(self, termo):
+        if len(termo) < 3:
+            return set()
+        conjuntos = sorted((self._por_trigrama.get(t, set()) for t in trigramas(termo)), key=len)
+        ids = set.intersection(*conjuntos)
+        return {id for id in ids if termo in self._nomes[id]}
+
+    def _por_cpf(self, digitos):
+        ids = set()
+        i = bisect_left(self._cpfs_ordenados, (digitos,))
+        while i < len(self._cpfs_ordenados) and self._cpfs_ordenados[i][0].startswith(digitos):
+            ids.add(self._cpfs_ordenados[i][1])
+            i += 1
+        return ids
+
+    def _pontuar(self, id, termos):
+        """Menor é melhor: palavra exata < prefixo de palavra < trecho do nome"""
+        pontos = 0
+        palavras = self._palavras.get(id, ())
+        for termo in termos:
+            if termo in palavras:
+                continue
+            pontos += 1 if any(p.startswith(termo) for p in palavras) else 2
+        return pontos
+
+    def buscar(self, consulta, limite=None):
+        """IDs que casam com todos os termos da consulta, do mais relevante ao menos"""
+        termos = normalizar(consulta).split()
+        if not termos:
+            return []
+        with self._lock:
+            digitos = re.sub(r'[^0-9]', '', consulta)
+            if digitos and not re.search(r'[^0-9.\-\s]', consulta):
+                ids = self._por_cpf(digitos)
+                pontos = {id: 0 for id in ids}
+            else:
+                ids = None
+                for termo in termos:
+                    encontrados = self._por_prefixo(termo) | self._por_trecho(termo)
+                    ids = encontrados if ids is None else ids & encontrados
+                    if not ids:
+                        return []
+                pontos = {id: self._pontuar(id, termos) for id in ids}
+            chave = lambda id: (pontos[id], self._nomes.get(id, ''), id)
+            if limite is None:
+                return sorted(pontos, key=chave)
+            return heapq.nsmallest(limite, pontos, key=chave)
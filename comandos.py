@@ -0,0 +1,197 @@
+import os
+import sys
+import json
+import shutil
+import click
+from app import app
+from utils import DATA_FILE
+
+
+@app.cli.command('importar-json')
+@click.option('--arquivo', default=DATA_FILE, show_default=True, help='Arquivo JSON de origem')
+def importar_json_command(arquivo):
+    """Importar motoristas do JSON para o banco SQL"""
+    from repositorio_sql import configurar_banco, db, importar_json
+    configurar_banco()
+    db.create_all()
+    try:
+        total = importar_json(arquivo)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f"{total} motoristas importados de {arquivo}")
+
+
+@app.cli.command('compactar-diario')
+def compactar_diario_command():
+    """Incorporar o diário motoristas.jsonl ao snapshot motoristas.json"""
+    from repositorio import RepositorioJSON
+    RepositorioJSON(DATA_FILE).compactar()
+    click.echo(f"Diário compactado em {DATA_FILE}")
+
+
+@app.cli.command('gerar-miniaturas')
+@click.option('--forcar', is_flag=True, help='Regerar miniaturas já existentes')
+def gerar_miniaturas_command(forcar):
+    """Gerar miniaturas das fotos já enviadas"""
+    from armazenamento import resolver
+    from miniaturas import pillow, gerar_miniaturas
+    from utils import get_motoristas
+    if pillow() is None:
+        raise click.ClickException('Pillow não está instalado (pip install pillow)')
+    total = 0
+    for motorista in get_motoristas():
+        foto = motorista.get('arquivos', {}).get('foto')
+        caminho = resolver(motorista, foto) if foto else None
+        if not caminho or not os.path.isfile(caminho):
+            continue
+        try:
+            total += len(gerar_miniaturas(caminho, forcar=forcar))
+        except Exception as e:
+            click.echo(f"Erro em {caminho}: {str(e)}", err=True)
+    click.echo(f"{total} miniaturas geradas")
+
+
+@app.cli.command('migrar-uploads')
+def migrar_uploads_command():
+    """Mover arquivos de uploads/<id>/ para o repositório de blobs"""
+    from armazenamento import salvar_blob
+    from miniaturas import eh_miniatura
+    from utils import get_motoristas, save_motorista
+    migrados = 0
+    for motorista in get_motoristas():
+        pasta = os.path.join(app.config['UPLOAD_FOLDER'], motorista['id'])
+        blobs = motorista.setdefault('blobs', {})
+        antigos = []
+        for raiz, pastas, nomes in os.walk(pasta):
+            for nome in nomes:
+                caminho = os.path.join(raiz, nome)
+                antigos.append(caminho)
+                referencia = os.path.relpath(caminho, pasta).replace(os.sep, '/')
+                if eh_miniatura(nome) or nome.endswith('.tmp') or referencia in blobs:
+                    continue
+                extensao = nome.rsplit('.', 1)[1].lower() if '.' in nome else 'bin'
+                with open(caminho, 'rb') as f:
+                    blobs[referencia] = salvar_blob(f, extensao)
+                migrados += 1
+        if not antigos:
+            continue
+        if not save_motorista(motorista):
+            raise click.ClickException(f"Erro ao salvar o motorista {motorista['id']}")
+        # Só apaga a pasta antiga depois que as referências foram gravadas
+        shutil.rmtree(pasta)
+    click.echo(f"{migrados} arquivos migrados para o repositório de blobs")
+
+
+@app.cli.command('indexar-holerites')
+def indexar_holerites_command():
+    """Reconstruir o índice de holerites a partir dos arquivos enviados"""
+    from armazenamento import resolver
+    from holerites import indexar
+    from utils import get_motoristas, save_motorista
+    total = 0
+    for motorista in get_motoristas():
+        motorista['holerites'] = indexar(motorista, resolver, app.config['UPLOAD_FOLDER'])
+        if not save_motorista(motorista):
+            raise click.ClickException(f"Erro ao salvar o motorista {motorista['id']}")
+        total += len(motorista['holerites'])
+    click.echo(f"{total} holerites indexados")
+
+
+@app.cli.command('importar-motoristas')
+@click.argument('arquivo', type=click.File('rb'))
+@click.option('--formato', type=click.Choice(['csv', 'jsonl']), help='Padrão: pela extensão do arquivo')
+def importar_motoristas_command(arquivo, formato):
+    """Importar motoristas em lote de um arquivo CSV ou JSONL"""
+    from importacao import formato_do_arquivo
+    from utils import import_motoristas
+    resultado = import_motoristas(arquivo, formato or formato_do_arquivo(arquivo.name))
+    for rejeitado in resultado['rejeitados']:
+        click.echo(f"Linha {rejeitado['linha']}: {rejeitado['motivo']} ({rejeitado['cpf'] or '-'})", err=True)
+    click.echo(f"{resultado['importados']} motoristas importados, {len(resultado['rejeitados'])} linhas rejeitadas")
+
+
+@app.cli.command('exportar-motoristas')
+@click.argument('destino', type=click.Path(dir_okay=False, writable=True))
+@click.option('--formato', type=click.Choice(['csv', 'jsonl']), help='Padrão: pela extensão do arquivo')
+def exportar_motoristas_command(destino, formato):
+    """Exportar todos os motoristas para um arquivo CSV ou JSONL"""
+    from importacao import formato_do_arquivo
+    from utils import export_motoristas
+    total = -1 if (formato or formato_do_arquivo(destino)) == 'csv' else 0
+    with open(destino, 'w', encoding='utf-8', newline='') as f:
+        for linha in export_motoristas(formato or formato_do_arquivo(destino)):
+            f.write(linha)
+            total += 1
+    click.echo(f"{total} motoristas exportados para {destino}")
+
+
+@app.cli.command('auditar-cpfs')
+@click.option('--arquivo', type=click.Path(exists=True, dir_okay=False),
+              help='JSON com a lista de motoristas (padrão: o cadastro atual, com o diário)')
+@click.option('--json', 'como_json', is_flag=True, help='Relatório em JSON')
+def auditar_cpfs_command(arquivo, como_json):
+    """Listar CPFs inválidos ou duplicados e celulares fora do padrão"""
+    from validacao import auditar
+    from utils import audit_motoristas
+    if arquivo:
+        with open(arquivo, 'r', encoding='utf-8') as f:
+            relatorio = auditar(json.load(f))
+    else:
+        relatorio = audit_motoristas()
+
+    if como_json:
+        click.echo(json.dumps(relatorio, ensure_ascii=False, indent=2))
+    else:
+        for motorista in relatorio['cpfs_invalidos']:
+            click.echo(f"CPF inválido: {motorista['cpf'] or '-'} ({motorista['nome']}, {motorista['id']})")
+        for cpf, motoristas in relatorio['cpfs_duplicados'].items():
+            nomes = ', '.join(f"{m['nome']} ({m['id']})" for m in motoristas)
+            click.echo(f"CPF {cpf} em {len(motoristas)} cadastros: {nomes}")
+        for motorista in relatorio['celulares_invalidos']:
+            click.echo(f"Celular fora do padrão: {motorista['celular']} ({motorista['nome']}, {motorista['id']})")
+        click.echo(f"{relatorio['total']} motoristas: {len(relatorio['cpfs_invalidos'])} CPFs inválidos, "
+                   f"{len(relatorio['cpfs_duplicados'])} CPFs duplicados, "
+                   f"{len(relatorio['celulares_invalidos'])} celulares fora do padrão")
+    # Código de saída 1 para uso em scripts agendados
+    if relatorio['cpfs_invalidos'] or relatorio['cpfs_duplicados']:
+        sys.exit(1)
+
+
+@app.cli.command('resumo-vencimentos')
+@click.option('--forcar', is_flag=True, help='Gerar mesmo que já tenha sido gerado hoje')
+def resumo_vencimentos_command(forcar):
+    """Gerar o resumo de vencimentos do dia em data/outbox (para agendar no cron)"""
+    from utils import generate_expiry_digest
+    resumo = generate_expiry_digest(forcar=forcar)
+    if resumo is None:
+        click.echo('Nenhum aviso novo (ou resumo já gerado hoje)')
+        return
+    for aviso in resumo['avisos']:
+        click.echo(f"{aviso['documento'].upper():<6} {aviso['validade']} ({aviso['dias']:>3} dias) {aviso['nome']}")
+    click.echo(f"{resumo['total']} avisos no resumo de {resumo['data']}")
+
+
+@app.cli.command('limpar-blobs')
+def limpar_blobs_command():
+    """Apagar blobs que nenhum motorista referencia e envios em blocos abandonados"""
+    from armazenamento import coletar_orfaos
+    from envios import chaves_pendentes, limpar_envios
+    from utils import contagem_blobs, repositorio
+    click.echo(f"{limpar_envios()} envios em blocos abandonados apagados")
+    repositorio.sincronizar()
+    click.echo(f"{coletar_orfaos(contagem_blobs, protegidas=chaves_pendentes())} blobs sem referência apagados")
+
+
+@app.cli.command('backup')
+@click.argument('destino', type=click.Path(dir_okay=False, writable=True))
+@click.option('--formato', type=click.Choice(['zip', 'tar']), default='zip', show_default=True)
+@click.option('--incremental', is_flag=True, help='Apenas arquivos alterados desde o último backup')
+def backup_command(destino, formato, incremental):
+    """Gravar backup dos dados e uploads em DESTINO"""
+    from backup import escrever_backup, salvar_manifesto, ultimo_manifesto
+    from utils import get_motoristas
+    base = ultimo_manifesto() if incremental else None
+    with open(destino, 'wb') as f:
+        manifesto = escrever_backup(f, get_motoristas(), app.config['UPLOAD_FOLDER'], formato, base)
+    salvar_manifesto(manifesto)
+    click.echo(f"Backup gravado em {destino} ({len(manifesto['arquivos'])} arquivos)")
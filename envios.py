@@ -0,0 +1,215 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+from datetime import datetime
+from app import app
+from repositorio import trava_arquivo, gravar_atomico
+from armazenamento import pasta_blobs, caminho_blob, trava_blobs
+
+# Tamanho sugerido de cada bloco enviado (abaixo de MAX_CONTENT_LENGTH)
+TAMANHO_BLOCO = 4 * 1024 * 1024
+
+# Tamanho máximo de um arquivo enviado em blocos
+TAMANHO_MAXIMO = 200 * 1024 * 1024
+
+# Envios incompletos ou não usados são descartados depois disso (segundos)
+VALIDADE = 24 * 3600
+
+
+class ErroEnvio(Exception):
+    """Erro do envio que o cliente pode corrigir (status HTTP em `status`)"""
+
+    def __init__(self, mensagem, status=400):
+        super().__init__(mensagem)
+        self.status = status
+
+
+def pasta_envios():
+    # Dentro da pasta de blobs: o arquivo parcial vira blob com um rename
+    return os.path.join(pasta_blobs(), '_envios')
+
+
+def _caminho(token, extensao):
+    return os.path.join(pasta_envios(), f"{token}.{extensao}")
+
+
+def _ler(token):
+    try:
+        with open(_caminho(token, 'json'), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _gravar(envio):
+    gravar_atomico(_caminho(envio['token'], 'json'), lambda f: json.dump(envio, f, ensure_ascii=False))
+
+
+def _validar_token(token):
+    try:
+        return str(uuid.UUID(token)) == token
+    except ValueError:
+        return False
+
+
+def iniciar_envio(nome, tamanho, sha256=None):
+    """Abrir um envio em blocos; retorna o estado com o `token`"""
+    extensao = nome.rsplit('.', 1)[1].lower()
+    if tamanho < 0 or tamanho > TAMANHO_MAXIMO:
+        raise ErroEnvio(f"Tamanho inválido (máximo {TAMANHO_MAXIMO // (1024 * 1024)}MB)")
+    if sha256 and (len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256.lower())):
+        raise ErroEnvio('Checksum SHA-256 inválido')
+    os.makedirs(pasta_envios(), exist_ok=True)
+    envio = {
+        'token': str(uuid.uuid4()),
+        'nome': nome,
+        'extensao': extensao,
+        'tamanho': tamanho,
+        'sha256': sha256.lower() if sha256 else None,
+        'recebido': 0,
+        'chave': None,
+        'criado_em': datetime.now().isoformat()
+    }
+    open(_caminho(envio['token'], 'part'), 'wb').close()
+    _gravar(envio)
+    if tamanho == 0:
+        return _concluir(envio)
+    return envio
+
+
+def obter_envio(token):
+    """Estado do envio (de qualquer worker), ou None"""
+    return _ler(token) if _validar_token(token) else None
+
+
+def _concluir(envio):
+    """Conferir o checksum do arquivo completo e movê-lo para o blob definitivo"""
+    parcial = _caminho(envio['token'], 'part')
+    sha256 = hashlib.sha256()
+    with open(parcial, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(bloco)
+    if envio['sha256'] and sha256.hexdigest() != envio['sha256']:
+        # Conteúdo corrompido: recomeça do zero
+        open(parcial, 'wb').close()
+        envio['recebido'] = 0
+        _gravar(envio)
+        raise ErroEnvio('Checksum do arquivo não confere; envie novamente', 422)
+
+    chave = f"{sha256.hexdigest()}.{envio['extensao']}"
+    destino = caminho_blob(chave)
+    with trava_blobs():
+        if os.path.exists(destino):
+            os.utime(destino)
+            os.remove(parcial)
+        else:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(parcial, destino)
+    envio['chave'] = chave
+    _gravar(envio)
+    return envio
+
+
+def receber_bloco(token, offset, stream, tamanho, sha256=None):
+    """Gravar um bloco no arquivo parcial a partir de `offset`.
+
+    O bloco deve continuar exatamente de onde o envio parou (`recebido`),
+    o que permite retomar após falhas consultando o estado. Com `sha256` o
+    bloco é conferido antes de ser aceito. O último bloco conclui o envio.
+    """
+    if not _validar_token(token):
+        raise ErroEnvio('Envio não encontrado', 404)
+    with trava_arquivo(_caminho(token, 'json')):
+        envio = _ler(token)
+        if envio is None:
+            raise ErroEnvio('Envio não encontrado', 404)
+        if envio['chave']:
+            raise ErroEnvio('Envio já concluído', 409)
+        if offset != envio['recebido']:
+            raise ErroEnvio(f"Offset esperado: {envio['recebido']}", 409)
+        if offset + tamanho > envio['tamanho']:
+            raise ErroEnvio('Bloco ultrapassa o tamanho do arquivo')
+
+        hash_bloco = hashlib.sha256()
+        lidos = 0
+        with open(_caminho(token, 'part'), 'r+b') as f:
+            f.seek(offset)
+            while lidos < tamanho:
+                dados = stream.read(min(1024 * 1024, tamanho - lidos))
+                if not dados:
+                    break
+                hash_bloco.update(dados)
+                f.write(dados)
+                lidos += len(dados)
+            if lidos != tamanho or (sha256 and hash_bloco.hexdigest() != sha256.lower()):
+                # Bloco incompleto ou corrompido: descarta o que foi escrito
+                f.truncate(offset)
+                raise ErroEnvio('Bloco incompleto ou com checksum diferente; envie novamente', 422)
+            f.flush()
+            os.fsync(f.fileno())
+
+        envio['recebido'] = offset + tamanho
+        if envio['recebido'] == envio['tamanho']:
+            return _concluir(envio)
+        _gravar(envio)
+        return envio
+
+
+def consumir_envio(token, extensoes=None):
+    """Chave do blob de um envio concluído, que deixa de existir como envio.
+
+    Retorna None se o token não for de um envio concluído (ou de extensão
+    não permitida).
+    """
+    envio = obter_envio(token)
+    if not envio or not envio['chave'] or (extensoes and envio['extensao'] not in extensoes):
+        return None
+    with trava_arquivo(_caminho(token, 'json')):
+        # O blob volta a ter carência para ganhar a referência
+        try:
+            with trava_blobs():
+                os.utime(caminho_blob(envio['chave']))
+        except FileNotFoundError:
+            return None
+        for sufixo in ('json', 'part'):
+            if os.path.exists(_caminho(token, sufixo)):
+                os.remove(_caminho(token, sufixo))
+    try:
+        os.remove(_caminho(token, 'json.lock'))
+    except OSError:
+        pass  # Em uso por outro processo; limpar_envios remove depois
+    return envio['chave']
+
+
+def chaves_pendentes():
+    """Blobs de envios concluídos que ainda não foram usados"""
+    if not os.path.isdir(pasta_envios()):
+        return set()
+    chaves = set()
+    for nome in os.listdir(pasta_envios()):
+        if nome.endswith('.json'):
+            envio = _ler(nome[:-len('.json')])
+            if envio and envio['chave']:
+                chaves.add(envio['chave'])
+    return chaves
+
+
+def limpar_envios(validade=VALIDADE):
+    """Apagar envios abandonados; retorna quantos"""
+    if not os.path.isdir(pasta_envios()):
+        return 0
+    limite = time.time() - validade
+    removidos = 0
+    for nome in os.listdir(pasta_envios()):
+        caminho = os.path.join(pasta_envios(), nome)
+        try:
+            if os.path.getmtime(caminho) <= limite:
+                os.remove(caminho)
+                removidos += nome.endswith('.json')
+        except FileNotFoundError:
+            continue
+    if removidos:
+        app.logger.info(f"{removidos} envios em blocos abandonados removidos")
+    return removidos
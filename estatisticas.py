@@ -0,0 +1,64 @@
+import threading
+from vencimentos import DOCUMENTOS, parse_data, classificar
+
+
+class CacheEstatisticas:
+    """Estatísticas do painel mantidas incrementalmente.
+
+    Cada alteração de motorista ajusta apenas os contadores afetados por ele;
+    a contagem completa só é refeita na virada do dia, quando documentos
+    mudam de faixa (ok -> vencendo -> vencido) sem que ninguém os altere.
+    """
+
+    def __init__(self, indice_vencimentos):
+        self._indice = indice_vencimentos
+        self._lock = threading.Lock()
+        self._ativos = {}
+        self._total_ativos = 0
+        self._dia = None
+        self._contadores = None
+
+    def _contribuicao(self, motorista, hoje):
+        vencidos = vencendo = 0
+        for campo in DOCUMENTOS.values():
+            status = classificar(parse_data(motorista.get(campo)), hoje)
+            if status == 'vencido':
+                vencidos += 1
+            elif status == 'vencendo':
+                vencendo += 1
+        return vencidos, vencendo
+
+    def recarregar(self, motoristas):
+        with self._lock:
+            self._ativos = {m['id']: m.get('status', 'ativo') == 'ativo' for m in motoristas}
+            self._total_ativos = sum(self._ativos.values())
+            self._dia = None
+
+    def aplicar(self, anterior, novo):
+        with self._lock:
+            if anterior is not None:
+                self._total_ativos -= self._ativos.pop(anterior['id'], False)
+            if novo is not None:
+                self._ativos[novo['id']] = novo.get('status', 'ativo') == 'ativo'
+                self._total_ativos += self._ativos[novo['id']]
+            if self._dia is None:
+                return
+            for motorista, sinal in ((anterior, -1), (novo, 1)):
+                if motorista is not None:
+                    vencidos, vencendo = self._contribuicao(motorista, self._dia)
+                    self._contadores['documentos_vencidos'] += sinal * vencidos
+                    self._contadores['documentos_vencendo'] += sinal * vencendo
+
+    def obter(self, hoje):
+        """Estatísticas do dia `hoje`, recalculando só na virada do dia"""
+        with self._lock:
+            if self._dia != hoje:
+                self._contadores = self._indice.contar(hoje)
+                self._dia = hoje
+            total = len(self._ativos)
+            return {
+                'total_motoristas': total,
+                'motoristas_ativos': self._total_ativos,
+                'motoristas_inativos': total - self._total_ativos,
+                **self._contadores
+            }
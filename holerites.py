@@ -0,0 +1,104 @@
+import os
+import hashlib
+from datetime import datetime
+
+EXTENSOES = ('.pdf', '.png', '.jpg', '.jpeg')
+
+
+def _numero(texto):
+    return (0, int(texto), '') if texto.isdigit() else (1, 0, texto)
+
+
+def _chave(holerite):
+    return (_numero(holerite['ano']), _numero(holerite['mes']), holerite['arquivo'])
+
+
+def _sha256(caminho):
+    sha256 = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(bloco)
+    return sha256.hexdigest()
+
+
+def criar_entrada(ano, mes, arquivo, caminho, hash=None, enviado_em=None, calcular_hash=True):
+    """Metadados do holerite guardados no cadastro do motorista"""
+    st = os.stat(caminho)
+    return {
+        'ano': ano,
+        'mes': mes,
+        'arquivo': arquivo,
+        'path': f"{ano}/{mes}/{arquivo}",
+        'tamanho': st.st_size,
+        'enviado_em': enviado_em or datetime.fromtimestamp(st.st_mtime).isoformat(),
+        'hash': hash or (_sha256(caminho) if calcular_hash else None)
+    }
+
+
+def registrar(holerites, entrada):
+    """Incluir o holerite na lista, substituindo o de mesmo caminho"""
+    holerites[:] = [h for h in holerites if h['path'] != entrada['path']]
+    holerites.append(entrada)
+    ordenar(holerites)
+
+
+def ordenar(holerites):
+    """Do mais recente para o mais antigo"""
+    holerites.sort(key=_chave, reverse=True)
+    return holerites
+
+
+def paginar(holerites, pagina=1, por_pagina=12):
+    inicio = (pagina - 1) * por_pagina
+    total = len(holerites)
+    return {
+        'holerites': holerites[inicio:inicio + por_pagina],
+        'total': total,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'paginas': (total + por_pagina - 1) // por_pagina
+    }
+
+
+def indexar(motorista, resolver, pasta_uploads, calcular_hash=True):
+    """Reconstruir os metadados a partir dos blobs e da pasta antiga holerites/<ano>/<mes>/.
+
+    `resolver(motorista, referencia)` dá o caminho de cada arquivo. Entradas
+    já indexadas mantêm a data de envio. Sem `calcular_hash` (só para exibir)
+    os arquivos fora do repositório de blobs ficam com hash None.
+    """
+    anteriores = {h['path']: h for h in motorista.get('holerites', [])}
+    caminhos = set()
+    for referencia in motorista.get('blobs', {}):
+        partes = referencia.split('/')
+        if len(partes) == 4 and partes[0] == 'holerites':
+            caminhos.add('/'.join(partes[1:]))
+    pasta = os.path.join(pasta_uploads, motorista['id'], 'holerites')
+    if os.path.isdir(pasta):
+        for ano in os.listdir(pasta):
+            pasta_ano = os.path.join(pasta, ano)
+            if not os.path.isdir(pasta_ano):
+                continue
+            for mes in os.listdir(pasta_ano):
+                pasta_mes = os.path.join(pasta_ano, mes)
+                if not os.path.isdir(pasta_mes):
+                    continue
+                for arquivo in os.listdir(pasta_mes):
+                    if arquivo.lower().endswith(EXTENSOES):
+                        caminhos.add(f"{ano}/{mes}/{arquivo}")
+
+    holerites = []
+    for path in caminhos:
+        ano, mes, arquivo = path.split('/')
+        caminho = resolver(motorista, f"holerites/{path}")
+        if not caminho or not os.path.isfile(caminho):
+            continue
+        chave = motorista.get('blobs', {}).get(f"holerites/{path}")
+        anterior = anteriores.get(path, {})
+        holerites.append(criar_entrada(
+            ano, mes, arquivo, caminho,
+            hash=chave.split('.', 1)[0] if chave else None,
+            enviado_em=anterior.get('enviado_em'),
+            calcular_hash=calcular_hash
+        ))
+    return ordenar(holerites)
@@ -0,0 +1,67 @@
+import io
+import csv
+import json
+
+# Colunas aceitas na importação e gravadas na exportação, nesta ordem
+CAMPOS = ('id', 'nome', 'cpf', 'data_nascimento', 'celular', 'tipo_vinculo',
+          'validade_cnh', 'validade_curso', 'status', 'data_cadastro')
+
+FORMATOS = {
+    'csv': 'text/csv',
+    'jsonl': 'application/x-ndjson',
+}
+
+
+def formato_do_arquivo(nome, padrao='csv'):
+    """Formato pela extensão do arquivo ('csv' ou 'jsonl')"""
+    extensao = (nome or '').rsplit('.', 1)[-1].lower()
+    if extensao in ('jsonl', 'ndjson', 'json'):
+        return 'jsonl'
+    return 'csv' if extensao == 'csv' else padrao
+
+
+def ler_linhas(arquivo, formato):
+    """Linhas do arquivo binário como (número da linha, dict ou None se ilegível).
+
+    O arquivo é lido aos poucos; CSVs aceitam ',' ou ';' como separador e
+    BOM do Excel.
+    """
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    if formato == 'jsonl':
+        for numero, linha in enumerate(texto, 1):
+            if not linha.strip():
+                continue
+            try:
+                dados = json.loads(linha)
+            except ValueError:
+                dados = None
+            yield numero, dados if isinstance(dados, dict) else None
+        return
+
+    cabecalho = texto.readline()
+    separador = ';' if cabecalho.count(';') > cabecalho.count(',') else ','
+    colunas = [c.strip().lower() for c in next(csv.reader([cabecalho], delimiter=separador), [])]
+    for numero, valores in enumerate(csv.reader(texto, delimiter=separador), 2):
+        if not any(v.strip() for v in valores):
+            continue
+        yield numero, {coluna: valor.strip() for coluna, valor in zip(colunas, valores)}
+
+
+def exportar(motoristas, formato):
+    """Gerador com as linhas de exportação (str), uma por motorista"""
+    if formato == 'jsonl':
+        for motorista in motoristas:
+            yield json.dumps({campo: motorista.get(campo) for campo in CAMPOS}, ensure_ascii=False) + '\n'
+        return
+
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(CAMPOS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    for motorista in motoristas:
+        escritor.writerow([motorista.get(campo) or '' for campo in CAMPOS])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
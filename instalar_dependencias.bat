@@ -5,7 +5,7 @@ echo =======================================
 echo.
 echo Instalando dependencias necessarias...
 echo.
-pip install flask flask-sqlalchemy gunicorn werkzeug
+pip install flask werkzeug pillow waitress
 echo.
 echo Instalacao concluida!
 echo.
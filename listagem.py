@@ -0,0 +1,56 @@
+import threading
+
+# Campos aceitos para ordenação da listagem
+CAMPOS_ORDENACAO = ('nome', 'cpf', 'data_cadastro', 'validade_cnh', 'validade_curso', 'status', 'tipo_vinculo')
+
+
+class IndiceListagem:
+    """Linhas resumidas dos motoristas para filtrar e ordenar a listagem.
+
+    Guarda só os campos usados em filtros e ordenação, na ordem de cadastro;
+    os registros completos são buscados apenas para a página pedida.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._linhas = {}
+
+    @staticmethod
+    def _linha(motorista):
+        linha = {campo: motorista.get(campo) or '' for campo in CAMPOS_ORDENACAO}
+        linha['nome'] = linha['nome'].casefold()
+        linha['status'] = motorista.get('status', 'ativo')
+        linha['tipo_vinculo'] = motorista.get('tipo_vinculo', 'registrado')
+        return linha
+
+    def recarregar(self, motoristas):
+        with self._lock:
+            self._linhas = {m['id']: self._linha(m) for m in motoristas}
+
+    def aplicar(self, anterior, novo):
+        with self._lock:
+            if novo is None:
+                self._linhas.pop(anterior['id'], None)
+            else:
+                self._linhas[novo['id']] = self._linha(novo)
+
+    def filtrar(self, status=None, tipo_vinculo=None, ids=None, aceitar=None, ordenar=None, decrescente=False):
+        """IDs dos motoristas que passam nos filtros, na ordem pedida.
+
+        `ids` restringe a um conjunto (ex.: resultado da busca) e `aceitar`
+        é um filtro adicional chamado com o ID do motorista.
+        """
+        with self._lock:
+            linhas = list(self._linhas.items())
+        selecionados = [
+            (id, linha) for id, linha in linhas
+            if (not status or linha['status'] == status)
+            and (not tipo_vinculo or linha['tipo_vinculo'] == tipo_vinculo)
+            and (ids is None or id in ids)
+            and (aceitar is None or aceitar(id))
+        ]
+        if ordenar in CAMPOS_ORDENACAO:
+            selecionados.sort(key=lambda item: item[1][ordenar], reverse=decrescente)
+        elif decrescente:
+            selecionados.reverse()
+        return [id for id, linha in selecionados]
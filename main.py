@@ -1,4 +1,67 @@
+import os
+import sys
+import json
+import time
+
+# Início do processo (para medir o tempo até o sistema ficar pronto)
+INICIO = time.perf_counter()
+
+# `app` no módulo: usado por `gunicorn main:app` e `flask --app main`
 from app import app
 
+HOST = os.environ.get('HOST', '0.0.0.0')
+PORTA = int(os.environ.get('PORT', 5000))
+
+# Threads do waitress atendendo requisições em paralelo
+THREADS = int(os.environ.get('THREADS', 8))
+
+# Hora do resumo diário de vencimentos (vazio desliga o agendador)
+HORA_AVISOS = os.environ.get('HORA_AVISOS', '6')
+
+
+def medir_inicializacao():
+    """Imprimir (JSON) o tempo de carga do sistema e da primeira requisição.
+
+    Usado por `main.py --medir-inicializacao` (também no executável) e pelos
+    benchmarks; a primeira requisição inclui a leitura do cadastro.
+    """
+    carga = time.perf_counter()
+    resposta = app.test_client().get('/')
+    resposta.get_data()
+    fim = time.perf_counter()
+    print(json.dumps({
+        'importacao_ms': round((carga - INICIO) * 1000, 1),
+        'primeira_requisicao_ms': round((fim - carga) * 1000, 1),
+        'total_ms': round((fim - INICIO) * 1000, 1),
+        'status': resposta.status_code
+    }))
+
+
+def servir():
+    """Servidor de produção (waitress); FLASK_DEBUG=1 usa o servidor de desenvolvimento"""
+    if HORA_AVISOS:
+        from avisos import agendar
+        from utils import generate_expiry_digest
+        agendar(generate_expiry_digest, int(HORA_AVISOS))
+    if os.environ.get('FLASK_DEBUG') == '1':
+        # Recarregador e depurador: inicia o sistema duas vezes, só para desenvolvimento
+        app.run(host=HOST, port=PORTA, debug=True)
+        return
+
+    pronto = f"Sistema pronto em {(time.perf_counter() - INICIO) * 1000:.0f} ms: http://localhost:{PORTA}"
+    try:
+        from waitress import serve
+    except ImportError:
+        app.logger.warning('waitress não instalado (pip install waitress); usando o servidor do Werkzeug')
+        app.logger.info(pronto)
+        app.run(host=HOST, port=PORTA, threaded=True)
+        return
+    app.logger.info(pronto)
+    serve(app, host=HOST, port=PORTA, threads=THREADS)
+
+
 if __name__ == '__main__':
-    app.run(host='0.0.0.0', port=5000, debug=True)
+    if '--medir-inicializacao' in sys.argv:
+        medir_inicializacao()
+    else:
+        servir()
@@ -1,16 +1,34 @@
 # -*- mode: python ; coding: utf-8 -*-
+#
+# Executável para Windows: pyinstaller main.spec (resultado em dist/main/).
+# Gerado como pasta (onedir) e sem UPX: o executável de arquivo único
+# descompacta tudo numa pasta temporária a cada início, o que deixa a
+# inicialização lenta em máquinas modestas. Mede-se com
+# `dist\main\main.exe --medir-inicializacao`.
+#
+# O executável usa o cadastro em JSON; o backend SQL (SQLAlchemy, Postgres)
+# fica de fora e exige rodar com Python.
 
 
 a = Analysis(
     ['main.py'],
     pathex=[],
     binaries=[],
-    datas=[],
-    hiddenimports=[],
+    datas=[('templates', 'templates'), ('static', 'static')],
+    # waitress é importado dentro de main.servir()
+    hiddenimports=['waitress'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
-    excludes=[],
+    excludes=[
+        # Backend SQL e dependências só do servidor Linux
+        'repositorio_sql', 'flask_sqlalchemy', 'sqlalchemy', 'psycopg2', 'gunicorn', 'email_validator',
+        # validacao.py usa NumPy se houver; no executável, o cálculo em Python
+        'numpy',
+        # Trazidos por dependências opcionais, nunca usados aqui
+        'tkinter', '_tkinter', 'PIL.ImageTk', 'PIL.ImageQt', 'PIL.ImageShow',
+        'unittest', 'pydoc', 'doctest', 'pdb', 'lib2to3', 'setuptools', 'pip',
+    ],
     noarchive=False,
     optimize=0,
 )
@@ -19,16 +37,13 @@ pyz = PYZ(a.pure)
 exe = EXE(
     pyz,
     a.scripts,
-    a.binaries,
-    a.datas,
     [],
+    exclude_binaries=True,
     name='main',
     debug=False,
     bootloader_ignore_signals=False,
     strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
+    upx=False,
     console=True,
     disable_windowed_traceback=False,
     argv_emulation=False,
@@ -36,3 +51,12 @@ exe = EXE(
     codesign_identity=None,
     entitlements_file=None,
 )
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='main',
+)
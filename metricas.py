@@ -0,0 +1,172 @@
+import os
+import re
+import time
+import threading
+from bisect import bisect_left
+from datetime import datetime
+
+# Limites (segundos) dos histogramas de duração
+LIMITES_DURACAO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+
+PASTA_PERFIS = 'data/perfis'
+
+
+def _rotulos(nomes, valores):
+    if not nomes:
+        return ''
+    pares = []
+    for nome, valor in zip(nomes, valores):
+        valor = str(valor).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pares.append(f'{nome}="{valor}"')
+    return '{' + ','.join(pares) + '}'
+
+
+class Contador:
+    """Contador monotônico com rótulos, no formato do Prometheus"""
+
+    tipo = 'counter'
+
+    def __init__(self, nome, descricao, rotulos=()):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self._lock = threading.Lock()
+        self._valores = {}
+
+    def inc(self, valor=1, *rotulos):
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0) + valor
+
+    def amostras(self):
+        with self._lock:
+            valores = dict(self._valores)
+        for rotulos, valor in sorted(valores.items()):
+            yield f"{self.nome}{_rotulos(self.rotulos, rotulos)} {valor}"
+
+
+class Histograma:
+    """Histograma cumulativo com rótulos, no formato do Prometheus"""
+
+    tipo = 'histogram'
+
+    def __init__(self, nome, descricao, rotulos=(), limites=LIMITES_DURACAO):
+        self.nome = nome
+        self.descricao = descricao
+        self.rotulos = tuple(rotulos)
+        self.limites = tuple(limites)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observar(self, valor, *rotulos):
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [[0] * (len(self.limites) + 1), 0.0, 0]
+            serie[0][bisect_left(self.limites, valor)] += 1
+            serie[1] += valor
+            serie[2] += 1
+
+    def amostras(self):
+        with self._lock:
+            series = {r: ([*s[0]], s[1], s[2]) for r, s in self._series.items()}
+        nomes = self.rotulos + ('le',)
+        for rotulos, (contagens, soma, total) in sorted(series.items()):
+            acumulado = 0
+            for limite, contagem in zip(self.limites + ('+Inf',), contagens):
+                acumulado += contagem
+                yield f"{self.nome}_bucket{_rotulos(nomes, rotulos + (limite,))} {acumulado}"
+            yield f"{self.nome}_sum{_rotulos(self.rotulos, rotulos)} {soma}"
+            yield f"{self.nome}_count{_rotulos(self.rotulos, rotulos)} {total}"
+
+
+requisicoes_duracao = Histograma(
+    'esturismo_http_request_duration_seconds', 'Duração das requisições por rota', ('endpoint', 'method'))
+requisicoes = Contador(
+    'esturismo_http_requests_total', 'Requisições por rota e status', ('endpoint', 'method', 'status'))
+repositorio_leituras = Contador(
+    'esturismo_repositorio_leituras_total',
+    'Leituras do cadastro: completa (snapshot e diário) ou incremental (fim do diário)', ('tipo',))
+repositorio_leitura_duracao = Histograma(
+    'esturismo_repositorio_leitura_duration_seconds', 'Duração das leituras do cadastro', ('tipo',))
+repositorio_gravacoes = Contador(
+    'esturismo_repositorio_gravacoes_total', 'Lotes gravados no diário do cadastro')
+repositorio_registros = Contador(
+    'esturismo_repositorio_registros_gravados_total', 'Registros (motoristas salvos ou removidos) gravados', ('op',))
+repositorio_gravacao_duracao = Histograma(
+    'esturismo_repositorio_gravacao_duration_seconds', 'Duração da gravação de cada lote, com a trava')
+arquivos_bytes = Contador(
+    'esturismo_download_bytes_total', 'Bytes de arquivos enviados por download_arquivo e miniatura', ('tipo',))
+backup_duracao = Histograma(
+    'esturismo_backup_duration_seconds', 'Duração da escrita dos backups', ('formato', 'incremental'))
+backups = Contador(
+    'esturismo_backups_total', 'Backups escritos por resultado', ('formato', 'resultado'))
+
+METRICAS = (
+    requisicoes_duracao, requisicoes,
+    repositorio_leituras, repositorio_leitura_duracao,
+    repositorio_gravacoes, repositorio_registros, repositorio_gravacao_duracao,
+    arquivos_bytes, backup_duracao, backups,
+)
+
+
+def exportar():
+    """Todas as métricas no formato texto do Prometheus"""
+    linhas = []
+    for metrica in METRICAS:
+        linhas.append(f"# HELP {metrica.nome} {metrica.descricao}")
+        linhas.append(f"# TYPE {metrica.nome} {metrica.tipo}")
+        linhas.extend(metrica.amostras())
+    return '\n'.join(linhas) + '\n'
+
+
+def instrumentar(app):
+    """Medir a duração de cada requisição e, se PROFILE_REQUESTS=1, gerar perfis.
+
+    Com o perfilador ligado, requisições com `?perfil=1` (ou cabeçalho
+    `X-Perfil: 1`) são executadas sob cProfile e o resultado é gravado em
+    data/perfis/<endpoint>_<data>.prof (abrir com `python -m pstats`). O
+    perfilador é desligado no teardown, que roda mesmo se a requisição
+    terminar com exceção.
+    """
+    from flask import g, request
+
+    perfilar = os.environ.get('PROFILE_REQUESTS') == '1'
+
+    @app.before_request
+    def iniciar_medicao():
+        g.inicio_requisicao = time.perf_counter()
+        if perfilar and (request.args.get('perfil') == '1' or request.headers.get('X-Perfil') == '1'):
+            import cProfile
+            perfil = cProfile.Profile()
+            try:
+                perfil.enable()
+            except ValueError:
+                # Outro perfil ativo (requisição simultânea): segue sem perfil
+                return
+            g.perfil = perfil
+            endpoint = re.sub(r'[^A-Za-z0-9_]', '_', request.endpoint or 'desconhecido')
+            g.perfil_arquivo = f"{endpoint}_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.prof"
+
+    @app.after_request
+    def registrar_medicao(response):
+        inicio = g.pop('inicio_requisicao', None)
+        endpoint = request.endpoint or 'desconhecido'
+        if inicio is not None:
+            requisicoes_duracao.observar(time.perf_counter() - inicio, endpoint, request.method)
+        requisicoes.inc(1, endpoint, request.method, str(response.status_code))
+        if 'perfil_arquivo' in g:
+            response.headers['X-Perfil'] = g.perfil_arquivo
+        return response
+
+    @app.teardown_request
+    def gravar_perfil(erro=None):
+        perfil = g.pop('perfil', None)
+        if perfil is None:
+            return
+        perfil.disable()
+        arquivo = g.pop('perfil_arquivo')
+        try:
+            os.makedirs(PASTA_PERFIS, exist_ok=True)
+            perfil.dump_stats(os.path.join(PASTA_PERFIS, arquivo))
+        except OSError as e:
+            app.logger.error(f"Erro ao gravar o perfil {arquivo}: {str(e)}")
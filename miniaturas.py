@@ -0,0 +1,76 @@
+import os
+from app import app
+
+# Pillow é importado só na primeira miniatura gerada (acelera a inicialização)
+_pillow = None
+
+# Lados (px) das miniaturas quadradas: 2x o tamanho exibido na lista (40px)
+# e na página do motorista (150px), para telas de alta densidade
+TAMANHOS = (80, 300)
+
+
+def pillow():
+    """Módulos (Image, ImageOps) do Pillow, ou None se não estiver instalado"""
+    global _pillow
+    if _pillow is None:
+        try:
+            from PIL import Image, ImageOps
+            _pillow = (Image, ImageOps)
+        except ImportError:  # Pillow não instalado: as páginas usam a foto original
+            _pillow = ()
+    return _pillow or None
+
+
+def caminho_miniatura(caminho_foto, tamanho):
+    """Caminho da miniatura, ao lado da foto original"""
+    base = os.path.splitext(caminho_foto)[0]
+    return f"{base}_mini{tamanho}.jpg"
+
+
+def eh_miniatura(nome_arquivo):
+    return any(nome_arquivo.endswith(f"_mini{tamanho}.jpg") for tamanho in TAMANHOS)
+
+
+def tamanho_adequado(tamanho):
+    """Menor tamanho pré-definido que atende ao pedido"""
+    for disponivel in TAMANHOS:
+        if disponivel >= tamanho:
+            return disponivel
+    return TAMANHOS[-1]
+
+
+def gerar_miniaturas(caminho_foto, forcar=False):
+    """Gerar as miniaturas da foto; retorna os caminhos gerados"""
+    if pillow() is None:
+        return []
+    Image, ImageOps = pillow()
+    gerados = []
+    with Image.open(caminho_foto) as imagem:
+        imagem = ImageOps.exif_transpose(imagem).convert('RGB')
+        for tamanho in TAMANHOS:
+            destino = caminho_miniatura(caminho_foto, tamanho)
+            if not forcar and os.path.exists(destino):
+                continue
+            miniatura = ImageOps.fit(imagem, (tamanho, tamanho), Image.LANCZOS)
+            temporario = destino + '.tmp'
+            miniatura.save(temporario, 'JPEG', quality=85, optimize=True)
+            os.replace(temporario, destino)
+            gerados.append(destino)
+    return gerados
+
+
+def tarefa_miniaturas(progresso, caminho_foto):
+    """Gerar miniaturas como tarefa de segundo plano"""
+    return gerar_miniaturas(caminho_foto)
+
+
+def obter_miniatura(caminho_foto, tamanho):
+    """Caminho da miniatura pronta (gerando se faltar) ou da foto original"""
+    destino = caminho_miniatura(caminho_foto, tamanho_adequado(tamanho))
+    if not os.path.exists(destino) and pillow() is not None:
+        try:
+            gerar_miniaturas(caminho_foto)
+        except Exception as e:
+            app.logger.warning(f"Erro ao gerar miniatura de {caminho_foto}: {str(e)}")
+    return destino if os.path.exists(destino) else caminho_foto
+
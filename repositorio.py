@@ -0,0 +1,447 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from contextlib import contextmanager
+from app import app
+import metricas
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def copiar_registro(valor):
+    """Copiar registro do motorista (dicts e listas aninhados)"""
+    if isinstance(valor, dict):
+        return {k: copiar_registro(v) for k, v in valor.items()}
+    if isinstance(valor, list):
+        return [copiar_registro(v) for v in valor]
+    return valor
+
+
+class CpfDuplicado(Exception):
+    """CPF já cadastrado para outro motorista"""
+
+
+def aplicar_alteracao(motorista, alteracao):
+    """Cópia de `motorista` com a alteração: dict de campos novos ou função
+    que altera (in place) a cópia recebida"""
+    novo = copiar_registro(motorista)
+    if callable(alteracao):
+        alteracao(novo)
+    else:
+        novo.update(copiar_registro(alteracao))
+    return novo
+
+
+@contextmanager
+def trava_arquivo(caminho):
+    """Trava exclusiva entre processos (workers do gunicorn) via arquivo .lock"""
+    pasta = os.path.dirname(caminho)
+    if pasta:
+        os.makedirs(pasta, exist_ok=True)
+    with open(caminho + '.lock', 'a+') as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                    break
+                except OSError:
+                    time.sleep(0.01)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def gravar_atomico(caminho, escrever):
+    """Gravar em arquivo temporário e renomear sobre o destino"""
+    pasta = os.path.dirname(caminho) or '.'
+    fd, temporario = tempfile.mkstemp(prefix='.tmp_', dir=pasta)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            escrever(f)
+            f.flush()
+            os.fsync(f.fileno())
+        for tentativa in range(5):
+            try:
+                os.replace(temporario, caminho)
+                break
+            except PermissionError:
+                # No Windows o destino pode estar aberto por um leitor
+                if tentativa == 4:
+                    raise
+                time.sleep(0.05)
+    except BaseException:
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        raise
+
+
+# Tamanho do diário a partir do qual ele é compactado no snapshot
+LIMITE_DIARIO = 1024 * 1024
+
+
+class RepositorioJSON:
+    """Motoristas mantidos em memória, indexados por id e CPF.
+
+    O estado persistido é o snapshot `motoristas.json` mais o diário
+    `motoristas.jsonl`, onde cada alteração é acrescentada como uma linha.
+    Antes de cada operação o repositório compara os dois arquivos com o que
+    já leu: o snapshot só é relido quando muda (após uma compactação) e do
+    diário só são aplicadas as linhas novas.
+
+    Escritas são confirmadas em grupo: alterações concorrentes do mesmo
+    processo entram numa fila e um único escritor acrescenta o lote inteiro
+    ao diário sob a trava entre processos. Quando o diário passa de
+    `limite_diario` bytes, uma thread o incorpora ao snapshot.
+    """
+
+    def __init__(self, caminho, limite_diario=LIMITE_DIARIO):
+        self.caminho = caminho
+        self.caminho_diario = os.path.splitext(caminho)[0] + '.jsonl'
+        self.limite_diario = limite_diario
+        self._lock = threading.RLock()
+        self._lock_escrita = threading.Lock()
+        self._lock_fila = threading.Lock()
+        self._pendentes = []
+        self._carregado = False
+        self._assinatura = None
+        self._inode_diario = None
+        self._offset_diario = 0
+        self._compactando = False
+        self._por_id = {}
+        self._por_cpf = {}
+        self._ouvintes = []
+
+    @staticmethod
+    def _assinatura_arquivo(caminho):
+        try:
+            st = os.stat(caminho)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    def assinar(self, ouvinte):
+        """Registrar um índice secundário a ser mantido junto com o repositório.
+
+        O ouvinte recebe `recarregar(motoristas)` quando o estado é relido por
+        completo e `aplicar(anterior, novo)` a cada alteração (None indica
+        inclusão ou remoção). Os registros recebidos não devem ser alterados.
+        """
+        with self._lock:
+            self._ouvintes.append(ouvinte)
+            if self._carregado:
+                ouvinte.recarregar(list(self._por_id.values()))
+
+    def sincronizar(self):
+        """Trazer estado em memória e índices secundários para o estado do disco"""
+        with self._lock:
+            self._sincronizar()
+
+    def _notificar(self, anterior, novo):
+        if anterior is None and novo is None:
+            return
+        for ouvinte in self._ouvintes:
+            ouvinte.aplicar(anterior, novo)
+
+    def _indexar(self, motoristas):
+        self._por_id = {}
+        self._por_cpf = {}
+        for motorista in motoristas:
+            self._por_id[motorista['id']] = motorista
+            if motorista.get('cpf'):
+                self._por_cpf[motorista['cpf']] = motorista['id']
+
+    def _aplicar(self, registro):
+        """Aplicar um registro do diário ao estado em memória"""
+        if registro['op'] == 'salvar':
+            motorista = registro['motorista']
+            anterior = self._por_id.get(motorista['id'])
+            self._por_id[motorista['id']] = motorista
+        else:
+            anterior = self._por_id.pop(registro['id'], None)
+            motorista = None
+        if anterior and anterior.get('cpf') and self._por_cpf.get(anterior['cpf']) == anterior['id']:
+            del self._por_cpf[anterior['cpf']]
+        if motorista and motorista.get('cpf'):
+            self._por_cpf[motorista['cpf']] = motorista['id']
+        return anterior
+
+    def _ler_diario(self, offset):
+        """Ler as linhas completas do diário a partir de `offset`"""
+        try:
+            with open(self.caminho_diario, 'rb') as f:
+                f.seek(offset)
+                dados = f.read()
+        except FileNotFoundError:
+            return [], 0
+        # Uma linha sem quebra no final ainda está sendo gravada
+        fim = dados.rfind(b'\n') + 1
+        registros = [json.loads(linha) for linha in dados[:fim].splitlines() if linha.strip()]
+        return registros, offset + fim
+
+    def _sincronizar(self, estrito=False):
+        """Recarregar snapshot e diário apenas se mudaram desde a última leitura"""
+        assinatura = self._assinatura_arquivo(self.caminho)
+        diario = self._assinatura_arquivo(self.caminho_diario)
+        inode_diario = diario[2] if diario else None
+        tamanho_diario = diario[1] if diario else 0
+        inicio = time.perf_counter()
+        try:
+            if (not self._carregado or assinatura != self._assinatura
+                    or (self._inode_diario is not None and inode_diario != self._inode_diario)
+                    or tamanho_diario < self._offset_diario):
+                motoristas = []
+                if assinatura is not None:
+                    with open(self.caminho, 'r', encoding='utf-8') as f:
+                        motoristas = json.load(f)
+                registros, offset = self._ler_diario(0)
+                completo = True
+            elif tamanho_diario > self._offset_diario:
+                registros, offset = self._ler_diario(self._offset_diario)
+                completo = False
+            else:
+                return
+        except (OSError, ValueError) as e:
+            # Escritores nunca gravam sobre arquivos que não conseguiram ler
+            if estrito:
+                raise
+            # Mantém o último estado válido e tenta novamente na próxima leitura
+            app.logger.error(f"Erro ao carregar motoristas: {str(e)}")
+            return
+        tipo = 'completa' if completo else 'incremental'
+        metricas.repositorio_leituras.inc(1, tipo)
+        metricas.repositorio_leitura_duracao.observar(time.perf_counter() - inicio, tipo)
+        if completo:
+            self._indexar(motoristas)
+            for registro in registros:
+                self._aplicar(registro)
+            self._carregado = True
+            for ouvinte in self._ouvintes:
+                ouvinte.recarregar(list(self._por_id.values()))
+        else:
+            for registro in registros:
+                self._notificar(self._aplicar(registro), registro.get('motorista'))
+        self._assinatura = assinatura
+        self._inode_diario = inode_diario
+        self._offset_diario = offset
+
+    def _confirmar(self, *registros):
+        """Enfileirar registros e aguardar a gravação do lote que os contém.
+
+        Retorna (anterior, novo) do último registro, resolvido contra o estado
+        mais recente do disco (ver `_resolver`).
+        """
+        pedido = self._pedido(registros)
+        self._enfileirar([pedido])
+        if pedido['erro']:
+            raise pedido['erro']
+        return pedido['resultado']
+
+    @staticmethod
+    def _pedido(registros):
+        return {'registros': registros, 'feito': False, 'erro': None, 'resultado': None}
+
+    def _enfileirar(self, pedidos):
+        """Enfileirar pedidos e aguardar a gravação do lote que os contém"""
+        with self._lock_fila:
+            self._pendentes.extend(pedidos)
+        with self._lock_escrita:
+            if not all(p['feito'] for p in pedidos):
+                with self._lock_fila:
+                    lote, self._pendentes = self._pendentes, []
+                self._gravar_lote(lote)
+
+    def _resolver(self, registro):
+        """Registro do diário ('salvar' ou 'remover') para uma operação da fila.
+
+        'atualizar' e 'inserir' são resolvidas aqui, sob a trava entre
+        processos e contra o registro mais recente: a alteração é aplicada
+        sobre o que está gravado e a unicidade do CPF é conferida. Retorna
+        None se o motorista a atualizar não existe.
+        """
+        if registro['op'] == 'atualizar':
+            atual = self._por_id.get(registro['id'])
+            if atual is None:
+                return None
+            registro = {'op': 'salvar', 'motorista': aplicar_alteracao(atual, registro['alteracao'])}
+        elif registro['op'] == 'inserir':
+            registro = {'op': 'salvar', 'motorista': registro['motorista']}
+        else:
+            return registro
+        motorista = registro['motorista']
+        dono = self._por_cpf.get(motorista.get('cpf'))
+        if motorista.get('cpf') and dono is not None and dono != motorista['id']:
+            raise CpfDuplicado(motorista['cpf'])
+        return registro
+
+    def _gravar_lote(self, lote):
+        inicio = time.perf_counter()
+        aplicados = []
+        try:
+            with trava_arquivo(self.caminho), self._lock:
+                self._sincronizar(estrito=True)
+                if os.path.exists(self.caminho_diario) and os.path.getsize(self.caminho_diario) > self._offset_diario:
+                    # Resto de uma gravação interrompida no meio de uma linha
+                    os.truncate(self.caminho_diario, self._offset_diario)
+                # Cada pedido vê os anteriores do lote; um pedido recusado (CPF
+                # duplicado, erro na alteração) não impede os demais
+                for pedido in lote:
+                    try:
+                        registros = [self._resolver(r) for r in pedido['registros']]
+                    except Exception as e:
+                        pedido['erro'] = e
+                        continue
+                    pedido['resultado'] = (None, None)
+                    for registro in registros:
+                        if registro is None:
+                            continue
+                        anterior = self._aplicar(registro)
+                        pedido['resultado'] = (anterior, registro.get('motorista'))
+                        aplicados.append((registro, anterior))
+                linhas = ''.join(json.dumps(r, ensure_ascii=False) + '\n' for r, _ in aplicados)
+                with open(self.caminho_diario, 'a', encoding='utf-8') as f:
+                    f.write(linhas)
+                    f.flush()
+                    os.fsync(f.fileno())
+                for registro, anterior in aplicados:
+                    self._notificar(anterior, registro.get('motorista'))
+                    metricas.repositorio_registros.inc(1, registro['op'])
+                metricas.repositorio_gravacoes.inc()
+                st = os.stat(self.caminho_diario)
+                self._inode_diario = st.st_ino
+                self._offset_diario = st.st_size
+                compactar = self._offset_diario > self.limite_diario and not self._compactando
+                if compactar:
+                    self._compactando = True
+        except Exception as e:
+            # O estado em memória pode ter parte do lote sem ele estar no
+            # disco: a próxima leitura recarrega tudo
+            self._carregado = False
+            for pedido in lote:
+                pedido['erro'] = pedido['erro'] or e
+            return
+        finally:
+            for pedido in lote:
+                pedido['feito'] = True
+            metricas.repositorio_gravacao_duracao.observar(time.perf_counter() - inicio)
+        if compactar:
+            threading.Thread(target=self.compactar, daemon=True).start()
+
+    def compactar(self):
+        """Incorporar o diário ao snapshot e recomeçar um diário vazio"""
+        try:
+            with trava_arquivo(self.caminho):
+                with self._lock:
+                    self._sincronizar(estrito=True)
+                    if self._offset_diario == 0:
+                        return
+                    motoristas = list(self._por_id.values())
+                gravar_atomico(self.caminho, lambda f: json.dump(motoristas, f, indent=2, ensure_ascii=False))
+                gravar_atomico(self.caminho_diario, lambda f: None)
+                with self._lock:
+                    self._assinatura = self._assinatura_arquivo(self.caminho)
+                    self._inode_diario = os.stat(self.caminho_diario).st_ino
+                    self._offset_diario = 0
+            app.logger.info(f"Diário compactado em {self.caminho} ({len(motoristas)} motoristas)")
+        except Exception as e:
+            app.logger.error(f"Erro ao compactar diário: {str(e)}")
+        finally:
+            self._compactando = False
+
+    def listar(self):
+        """Obter cópia de todos os motoristas, na ordem de cadastro"""
+        with self._lock:
+            self._sincronizar()
+            return [copiar_registro(m) for m in self._por_id.values()]
+
+    def contar(self):
+        with self._lock:
+            self._sincronizar()
+            return len(self._por_id)
+
+    def obter(self, id):
+        """Obter motorista por ID em O(1)"""
+        with self._lock:
+            self._sincronizar()
+            motorista = self._por_id.get(id)
+            return copiar_registro(motorista) if motorista else None
+
+    def obter_por_cpf(self, cpf):
+        """Obter motorista por CPF em O(1)"""
+        with self._lock:
+            self._sincronizar()
+            id = self._por_cpf.get(cpf)
+            return copiar_registro(self._por_id[id]) if id else None
+
+    def cpfs(self):
+        """Conjunto dos CPFs cadastrados"""
+        with self._lock:
+            self._sincronizar()
+            return set(self._por_cpf)
+
+    def salvar(self, motorista):
+        """Inserir ou atualizar motorista"""
+        self._confirmar({'op': 'salvar', 'motorista': copiar_registro(motorista)})
+
+    def inserir(self, motorista):
+        """Incluir motorista novo; CpfDuplicado se o CPF já for de outro motorista"""
+        self._confirmar({'op': 'inserir', 'motorista': copiar_registro(motorista)})
+
+    def inserir_varios(self, motoristas):
+        """Incluir vários motoristas novos numa única gravação do diário.
+
+        Cada um é conferido como em `inserir`, sob a trava; os recusados não
+        impedem os demais. Retorna, na ordem recebida, o CpfDuplicado de cada
+        motorista recusado ou None para os incluídos.
+        """
+        pedidos = [self._pedido(({'op': 'inserir', 'motorista': copiar_registro(m)},)) for m in motoristas]
+        if pedidos:
+            self._enfileirar(pedidos)
+        for pedido in pedidos:
+            if pedido['erro'] and not isinstance(pedido['erro'], CpfDuplicado):
+                raise pedido['erro']
+        return [pedido['erro'] for pedido in pedidos]
+
+    def atualizar(self, id, alteracao):
+        """Alterar o motorista sobre o registro mais recente, sob a trava de escrita.
+
+        `alteracao` é um dict com os campos novos ou uma função que altera a
+        cópia do registro recebida (executada sob a trava: não deve acessar o
+        repositório). Retorna o motorista alterado, ou None se
+        não existir; CpfDuplicado se o CPF novo já for de outro motorista.
+        """
+        if not callable(alteracao):
+            alteracao = copiar_registro(alteracao)
+        novo = self._confirmar({'op': 'atualizar', 'id': id, 'alteracao': alteracao})[1]
+        return copiar_registro(novo) if novo else None
+
+    def salvar_varios(self, motoristas):
+        """Inserir ou atualizar vários motoristas numa única gravação do diário"""
+        registros = [{'op': 'salvar', 'motorista': copiar_registro(m)} for m in motoristas]
+        if registros:
+            self._confirmar(*registros)
+
+    def remover(self, id):
+        """Remover motorista; retorna False se não existir"""
+        return self._confirmar({'op': 'remover', 'id': id})[0] is not None
+
+
+def criar_repositorio(caminho_json):
+    """Criar o repositório conforme STORAGE_BACKEND ('json' ou 'sql')"""
+    if app.config.get('STORAGE_BACKEND') == 'sql':
+        from repositorio_sql import RepositorioSQL
+        return RepositorioSQL(caminho_json)
+    return RepositorioJSON(caminho_json)
@@ -0,0 +1,348 @@
+import os
+import time
+import threading
+from datetime import datetime
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from app import app
+from repositorio import RepositorioJSON, CpfDuplicado, aplicar_alteracao, copiar_registro
+from validacao import duplicados
+import metricas
+
+db = SQLAlchemy()
+
+# Campos promovidos a colunas para consultas indexadas; o registro completo
+# (incluindo arquivos e campos extras) fica na coluna `dados`
+CAMPOS_INDEXADOS = ('cpf', 'nome', 'status', 'tipo_vinculo', 'validade_cnh', 'validade_curso', 'data_cadastro')
+
+
+class Motorista(db.Model):
+    __tablename__ = 'motoristas'
+
+    id = db.Column(db.String(36), primary_key=True)
+    cpf = db.Column(db.String(11), unique=True, index=True)
+    nome = db.Column(db.String(200))
+    status = db.Column(db.String(20))
+    tipo_vinculo = db.Column(db.String(20))
+    validade_cnh = db.Column(db.String(10))
+    validade_curso = db.Column(db.String(10))
+    data_cadastro = db.Column(db.String(32))
+    dados = db.Column(db.JSON, nullable=False)
+
+    def preencher(self, motorista):
+        for campo in CAMPOS_INDEXADOS:
+            setattr(self, campo, motorista.get(campo) or None)
+        self.dados = motorista
+
+
+class Versao(db.Model):
+    """Contador incrementado a cada escrita, para detectar alterações de outros workers"""
+    __tablename__ = 'versao'
+
+    id = db.Column(db.Integer, primary_key=True)
+    valor = db.Column(db.Integer, nullable=False, default=0)
+
+
+class Migracao(db.Model):
+    """Migrações já aplicadas, gravadas na mesma transação que as aplicou"""
+    __tablename__ = 'migracoes'
+
+    nome = db.Column(db.String(50), primary_key=True)
+    aplicada_em = db.Column(db.String(32), nullable=False)
+
+
+def configurar_banco():
+    """Inicializar o banco (SQLite por padrão, Postgres via DATABASE_URL)"""
+    if 'sqlalchemy' in app.extensions:
+        return
+    uri = os.environ.get('DATABASE_URL') or 'sqlite:///' + os.path.abspath('data/motoristas.db')
+    if uri.startswith('postgres://'):
+        uri = uri.replace('postgres://', 'postgresql://', 1)
+    app.config.setdefault('SQLALCHEMY_DATABASE_URI', uri)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {'pool_pre_ping': True})
+    db.init_app(app)
+
+
+def _cpfs_conflitantes(motoristas):
+    """CPFs repetidos no arquivo ou já cadastrados no banco para outro ID"""
+    conflitos = set(duplicados([m.get('cpf') for m in motoristas]))
+    ids = {m['cpf']: m['id'] for m in motoristas if m.get('cpf')}
+    cpfs = list(ids)
+    for i in range(0, len(cpfs), 500):
+        for id, cpf in db.session.query(Motorista.id, Motorista.cpf).filter(Motorista.cpf.in_(cpfs[i:i + 500])):
+            if id != ids[cpf]:
+                conflitos.add(cpf)
+    return sorted(conflitos)
+
+
+def _importar(caminho):
+    """Gravar na transação corrente os motoristas do JSON (e seu diário).
+
+    Nada é gravado se houver CPF repetido: ValueError com a lista dos CPFs.
+    """
+    motoristas = RepositorioJSON(caminho).listar()
+    conflitos = _cpfs_conflitantes(motoristas)
+    if conflitos:
+        raise ValueError(f"{len(conflitos)} CPFs repetidos em {caminho} (corrigir e importar de novo; "
+                         f"`flask --app main auditar-cpfs` lista os cadastros): {', '.join(conflitos)}")
+    for motorista in motoristas:
+        registro = db.session.get(Motorista, motorista['id']) or Motorista(id=motorista['id'])
+        registro.preencher(motorista)
+        db.session.add(registro)
+    db.session.query(Versao).filter_by(id=1).update({Versao.valor: Versao.valor + 1})
+    return len(motoristas)
+
+
+def importar_json(caminho):
+    """Importar motoristas de um arquivo JSON (e seu diário) em uma única transação"""
+    try:
+        total = _importar(caminho)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return total
+
+
+def _remover_indices_validade():
+    # As datas de validade são consultadas pelo índice em memória (vencimentos.py)
+    for coluna in ('validade_cnh', 'validade_curso'):
+        db.session.execute(text(f'DROP INDEX IF EXISTS ix_motoristas_{coluna}'))
+
+
+def migrar(caminho_json):
+    """Aplicar as migrações pendentes, cada uma numa transação com seu marcador.
+
+    A importação do JSON legado roda uma vez, num banco ainda vazio; falhas
+    desfazem a migração inteira e são propagadas.
+    """
+    try:
+        db.session.add(Versao(id=1, valor=0))
+        db.session.commit()
+    except IntegrityError:  # Criada antes (ou por outro worker)
+        db.session.rollback()
+
+    def importar():
+        # Bancos criados antes do marcador já tiveram o JSON importado
+        if db.session.query(Motorista.id).first() is None and caminho_json and os.path.exists(caminho_json):
+            total = _importar(caminho_json)
+            app.logger.info(f"{total} motoristas importados de {caminho_json}")
+
+    for nome, aplicar in (('importar_json', importar), ('remover_indices_validade', _remover_indices_validade)):
+        aplicada = db.session.get(Migracao, nome) is not None
+        db.session.commit()
+        if aplicada:
+            continue
+        try:
+            # Trava de escrita (linha de versão): outro worker iniciando espera aqui
+            db.session.query(Versao).filter_by(id=1).update({Versao.valor: Versao.valor + 1})
+            if db.session.get(Migracao, nome) is None:
+                aplicar()
+                db.session.add(Migracao(nome=nome, aplicada_em=datetime.now().isoformat()))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+
+class RepositorioSQL:
+    """Motoristas persistidos em banco relacional via SQLAlchemy.
+
+    Escritas afetam apenas a linha do motorista; buscas por id e CPF usam
+    os índices do banco.
+    """
+
+    def __init__(self, caminho_json=None):
+        configurar_banco()
+        with app.app_context():
+            db.create_all()
+            try:
+                migrar(caminho_json)
+            except Exception as e:
+                # Sem os dados migrados o sistema serviria um cadastro vazio
+                raise RuntimeError(f"Migração do banco falhou, nada foi gravado: {str(e)}") from e
+        self._lock = threading.RLock()
+        self._ouvintes = []
+        self._versao = None
+
+    def assinar(self, ouvinte):
+        """Registrar um índice secundário (ver RepositorioJSON.assinar)"""
+        with self._lock:
+            self._ouvintes.append(ouvinte)
+            self._versao = None
+
+    def sincronizar(self):
+        """Recarregar os índices secundários se outro worker alterou o banco"""
+        if not self._ouvintes:
+            return
+        with self._lock:
+            versao = db.session.get(Versao, 1, populate_existing=True).valor
+            if versao != self._versao:
+                inicio = time.perf_counter()
+                motoristas = [r.dados for r in Motorista.query.order_by(Motorista.data_cadastro, Motorista.id)]
+                for ouvinte in self._ouvintes:
+                    ouvinte.recarregar(motoristas)
+                self._versao = versao
+                metricas.repositorio_leituras.inc(1, 'completa')
+                metricas.repositorio_leitura_duracao.observar(time.perf_counter() - inicio, 'completa')
+
+    def _travar_escrita(self):
+        """Abrir a transação de escrita incrementando a versão.
+
+        A atualização da linha de versão serializa os escritores (trava da
+        linha no Postgres, trava de escrita no SQLite), então o que for lido
+        depois dela é o estado mais recente.
+        """
+        # Encerra a transação de leitura da requisição (snapshot antigo no SQLite)
+        db.session.commit()
+        db.session.query(Versao).filter_by(id=1).update({Versao.valor: Versao.valor + 1})
+
+    def _cpf_em_uso(self, motorista):
+        cpf = motorista.get('cpf')
+        return bool(cpf) and db.session.query(Motorista.id).filter(
+            Motorista.cpf == cpf, Motorista.id != motorista['id']).first() is not None
+
+    def _confirmar(self, alteracoes, travado=False):
+        """Incrementar a versão na transação corrente, confirmar e notificar índices.
+
+        `alteracoes` é uma lista de pares (anterior, novo) dos motoristas
+        gravados; com `travado` a versão já foi incrementada por `_travar_escrita`.
+        """
+        with self._lock:
+            inicio = time.perf_counter()
+            if not travado:
+                db.session.query(Versao).filter_by(id=1).update({Versao.valor: Versao.valor + 1})
+            versao = db.session.get(Versao, 1, populate_existing=True).valor
+            db.session.commit()
+            metricas.repositorio_gravacao_duracao.observar(time.perf_counter() - inicio)
+            metricas.repositorio_gravacoes.inc()
+            for anterior, novo in alteracoes:
+                metricas.repositorio_registros.inc(1, 'salvar' if novo is not None else 'remover')
+            if self._versao is not None and versao == self._versao + 1:
+                for anterior, novo in alteracoes:
+                    if anterior is not None or novo is not None:
+                        for ouvinte in self._ouvintes:
+                            ouvinte.aplicar(anterior, novo)
+                self._versao = versao
+            else:
+                # Houve escritas de outro worker no meio: recarga completa na próxima leitura
+                self._versao = None
+
+    def listar(self):
+        """Obter todos os motoristas, na ordem de cadastro"""
+        registros = Motorista.query.order_by(Motorista.data_cadastro, Motorista.id).all()
+        return [copiar_registro(r.dados) for r in registros]
+
+    def contar(self):
+        return Motorista.query.count()
+
+    def obter(self, id):
+        registro = db.session.get(Motorista, id)
+        return copiar_registro(registro.dados) if registro else None
+
+    def obter_por_cpf(self, cpf):
+        registro = Motorista.query.filter_by(cpf=cpf).first()
+        return copiar_registro(registro.dados) if registro else None
+
+    def cpfs(self):
+        """Conjunto dos CPFs cadastrados, sem carregar os registros"""
+        return {cpf for (cpf,) in db.session.query(Motorista.cpf) if cpf}
+
+    def salvar(self, motorista):
+        """Inserir ou atualizar apenas a linha do motorista"""
+        self.salvar_varios([motorista])
+
+    def inserir(self, motorista):
+        """Incluir motorista novo; CpfDuplicado se o CPF já for de outro motorista"""
+        try:
+            self._travar_escrita()
+            if self._cpf_em_uso(motorista):
+                raise CpfDuplicado(motorista['cpf'])
+            registro = Motorista(id=motorista['id'])
+            registro.preencher(copiar_registro(motorista))
+            db.session.add(registro)
+            self._confirmar([(None, registro.dados)], travado=True)
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def inserir_varios(self, motoristas):
+        """Incluir vários motoristas novos numa única transação (ver RepositorioJSON.inserir_varios)"""
+        try:
+            self._travar_escrita()
+            cpfs = [m['cpf'] for m in motoristas if m.get('cpf')]
+            donos = {}
+            for i in range(0, len(cpfs), 500):
+                donos.update(db.session.query(Motorista.cpf, Motorista.id).filter(Motorista.cpf.in_(cpfs[i:i + 500])))
+            recusas = []
+            alteracoes = []
+            for motorista in motoristas:
+                cpf = motorista.get('cpf')
+                if cpf and donos.get(cpf, motorista['id']) != motorista['id']:
+                    recusas.append(CpfDuplicado(cpf))
+                    continue
+                if cpf:
+                    donos[cpf] = motorista['id']
+                registro = Motorista(id=motorista['id'])
+                registro.preencher(copiar_registro(motorista))
+                db.session.add(registro)
+                alteracoes.append((None, registro.dados))
+                recusas.append(None)
+            self._confirmar(alteracoes, travado=True)
+        except Exception:
+            db.session.rollback()
+            raise
+        return recusas
+
+    def atualizar(self, id, alteracao):
+        """Alterar o motorista sobre a linha mais recente (ver RepositorioJSON.atualizar)"""
+        try:
+            self._travar_escrita()
+            registro = db.session.get(Motorista, id, populate_existing=True, with_for_update=True)
+            if registro is None:
+                db.session.rollback()
+                return None
+            anterior = registro.dados
+            novo = aplicar_alteracao(anterior, alteracao)
+            if novo.get('cpf') != anterior.get('cpf') and self._cpf_em_uso(novo):
+                raise CpfDuplicado(novo['cpf'])
+            registro.preencher(novo)
+            self._confirmar([(anterior, registro.dados)], travado=True)
+            return copiar_registro(novo)
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def salvar_varios(self, motoristas):
+        """Inserir ou atualizar vários motoristas numa única transação"""
+        try:
+            alteracoes = []
+            ids = [m['id'] for m in motoristas]
+            existentes = {}
+            for i in range(0, len(ids), 500):
+                existentes.update((r.id, r) for r in Motorista.query.filter(Motorista.id.in_(ids[i:i + 500])))
+            for motorista in motoristas:
+                registro = existentes.get(motorista['id'])
+                anterior = registro.dados if registro else None
+                registro = existentes[motorista['id']] = registro or Motorista(id=motorista['id'])
+                registro.preencher(copiar_registro(motorista))
+                db.session.add(registro)
+                alteracoes.append((anterior, registro.dados))
+            self._confirmar(alteracoes)
+        except Exception:
+            db.session.rollback()
+            raise
+
+    def remover(self, id):
+        try:
+            registro = db.session.get(Motorista, id)
+            if registro is None:
+                return False
+            anterior = registro.dados
+            db.session.delete(registro)
+            self._confirmar([(anterior, None)])
+        except Exception:
+            db.session.rollback()
+            raise
+        return True
@@ -1,57 +1,70 @@
 import os
-import json
+import posixpath
 import uuid
 import shutil
-from datetime import datetime, timedelta
-from flask import render_template, request, redirect, url_for, flash, jsonify, send_file
+from datetime import datetime
+from flask import render_template, request, redirect, url_for, flash, jsonify, send_file, Response, stream_with_context
 from werkzeug.utils import secure_filename
+from werkzeug.security import safe_join
 from app import app
-from utils import validate_cpf, format_phone, get_motoristas, save_motorista, get_motorista_by_id, update_motorista, create_backup
+import metricas
+from miniaturas import obter_miniatura, tarefa_miniaturas
+from tarefas import enfileirar, obter_tarefa
+from backup import PASTA_MANIFESTOS
+from armazenamento import resolver, versao_blob
+from repositorio import CpfDuplicado
+from envios import TAMANHO_BLOCO, ErroEnvio, iniciar_envio, obter_envio, receber_bloco, consumir_envio
+from utils import validate_cpf, format_phone, create_motorista, get_motorista_by_id, get_motorista_by_cpf, update_motorista, remove_motorista, start_backup, stream_backup, store_file, release_files, get_holerites, add_holerite, import_motoristas, export_motoristas, get_expiry_digest, count_motoristas, get_status_documentos, get_estatisticas, get_proximos_vencimentos, get_pagina_motoristas, search_motoristas
+from importacao import FORMATOS as FORMATOS_IMPORTACAO, formato_do_arquivo
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'pdf'}
 
+# Campos devolvidos pela busca quando `campos` não é informado
+CAMPOS_BUSCA = ('id', 'nome', 'cpf', 'celular')
+
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+def arquivo_enviado(campo):
+    """(chave do blob, extensão) do arquivo do campo, ou (None, None).
+
+    O arquivo pode ter sido enviado antes em blocos (campo `<campo>_token`)
+    ou vir no próprio formulário. ErroEnvio se o token não for de um envio
+    concluído (desconhecido, expirado ou incompleto).
+    """
+    token = request.form.get(f"{campo}_token")
+    if token:
+        chave = consumir_envio(token, ALLOWED_EXTENSIONS)
+        if not chave:
+            raise ErroEnvio(f"O envio do arquivo ({campo}) expirou ou não foi concluído. Envie o arquivo novamente.")
+        return chave, chave.rsplit('.', 1)[1]
+    file = request.files.get(campo)
+    if file and file.filename and allowed_file(file.filename):
+        extensao = file.filename.rsplit('.', 1)[1].lower()
+        return store_file(file, extensao), extensao
+    return None, None
+
+def projetar(motorista, campos):
+    """Manter apenas os campos pedidos do motorista"""
+    return {campo: motorista[campo] for campo in campos if campo in motorista}
+
+def campos_pedidos(padrao):
+    """Campos do parâmetro `campos` (separados por vírgula) ou o padrão"""
+    campos = request.args.get('campos', '')
+    return [c.strip() for c in campos.split(',') if c.strip()] or list(padrao)
+
 @app.route('/')
 def index():
     """Página inicial com estatísticas"""
-    motoristas = get_motoristas()
-    total_motoristas = len(motoristas)
-    
-    # Contar documentos vencidos
-    documentos_vencidos = 0
-    documentos_vencendo = 0
-    hoje = datetime.now().date()
-    
-    for motorista in motoristas:
-        if motorista.get('validade_cnh'):
-            try:
-                validade_cnh = datetime.strptime(motorista['validade_cnh'], '%Y-%m-%d').date()
-                if validade_cnh < hoje:
-                    documentos_vencidos += 1
-                elif validade_cnh <= hoje + timedelta(days=30):
-                    documentos_vencendo += 1
-            except ValueError:
-                pass
-                
-        if motorista.get('validade_curso'):
-            try:
-                validade_curso = datetime.strptime(motorista['validade_curso'], '%Y-%m-%d').date()
-                if validade_curso < hoje:
-                    documentos_vencidos += 1
-                elif validade_curso <= hoje + timedelta(days=30):
-                    documentos_vencendo += 1
-            except ValueError:
-                pass
-    
-    stats = {
-        'total_motoristas': total_motoristas,
-        'documentos_vencidos': documentos_vencidos,
-        'documentos_vencendo': documentos_vencendo
-    }
-    
-    return render_template('index.html', stats=stats)
+    return render_template('index.html', stats=get_estatisticas())
+
+@app.route('/estatisticas')
+def estatisticas():
+    """Estatísticas do painel em JSON (para painéis que consultam periodicamente)"""
+    response = jsonify(get_estatisticas())
+    response.add_etag()
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
 
 @app.route('/cadastro')
 def cadastro():
@@ -69,21 +82,13 @@ def cadastro_post():
             return redirect(url_for('cadastro'))
         
         # Verificar se CPF já existe
-        motoristas = get_motoristas()
-        for motorista in motoristas:
-            if motorista.get('cpf') == cpf:
-                flash('CPF já cadastrado', 'error')
-                return redirect(url_for('cadastro'))
+        if get_motorista_by_cpf(cpf):
+            flash('CPF já cadastrado', 'error')
+            return redirect(url_for('cadastro'))
         
         # Criar ID único
         motorista_id = str(uuid.uuid4())
         
-        # Criar pasta do motorista
-        motorista_folder = os.path.join(app.config['UPLOAD_FOLDER'], motorista_id)
-        os.makedirs(motorista_folder, exist_ok=True)
-        os.makedirs(os.path.join(motorista_folder, 'documentos'), exist_ok=True)
-        os.makedirs(os.path.join(motorista_folder, 'holerites'), exist_ok=True)
-        
         # Dados do motorista
         motorista = {
             'id': motorista_id,
@@ -96,44 +101,50 @@ def cadastro_post():
             'validade_curso': request.form.get('validade_curso'),
             'data_cadastro': datetime.now().isoformat(),
             'status': 'ativo',
-            'arquivos': {}
+            'arquivos': {},
+            'blobs': {},
+            'holerites': []
         }
         
         # Upload da foto
-        if 'foto' in request.files:
-            foto = request.files['foto']
-            if foto and foto.filename and allowed_file(foto.filename):
-                # Criar nome único para foto
-                extensao = foto.filename.rsplit('.', 1)[1].lower()
-                filename = f"foto_{motorista_id}.{extensao}"
-                foto_path = os.path.join(motorista_folder, filename)
-                foto.save(foto_path)
-                motorista['arquivos']['foto'] = filename
-                app.logger.info(f"Foto salva: {foto_path}")
-            else:
-                app.logger.warning("Foto não enviada ou formato inválido")
+        chave, extensao = arquivo_enviado('foto')
+        if chave:
+            # Criar nome único para foto
+            filename = f"foto_{motorista_id}.{extensao}"
+            motorista['blobs'][filename] = chave
+            motorista['arquivos']['foto'] = filename
+            app.logger.info(f"Foto salva: {chave}")
+            enfileirar('miniaturas', tarefa_miniaturas, resolver(motorista, filename))
+        else:
+            app.logger.warning("Foto não enviada ou formato inválido")
         
         # Upload dos documentos
         documentos = ['cnh', 'curso_passageiro', 'comprovante_residencia']
         for doc in documentos:
-            if doc in request.files:
-                file = request.files[doc]
-                if file and file.filename and allowed_file(file.filename):
-                    extensao = file.filename.rsplit('.', 1)[1].lower()
-                    filename = f"{doc}_{motorista_id}.{extensao}"
-                    file_path = os.path.join(motorista_folder, 'documentos', filename)
-                    file.save(file_path)
-                    motorista['arquivos'][doc] = filename
-                    app.logger.info(f"Documento {doc} salvo: {file_path}")
-                else:
-                    app.logger.warning(f"Documento {doc} não enviado ou formato inválido")
+            chave, extensao = arquivo_enviado(doc)
+            if chave:
+                filename = f"{doc}_{motorista_id}.{extensao}"
+                motorista['blobs'][f"documentos/{filename}"] = chave
+                motorista['arquivos'][doc] = filename
+                app.logger.info(f"Documento {doc} salvo: {chave}")
+            else:
+                app.logger.warning(f"Documento {doc} não enviado ou formato inválido")
         
-        # Salvar motorista
-        save_motorista(motorista)
+        # Salvar motorista (o CPF é conferido de novo sob a trava de escrita)
+        create_motorista(motorista)
         
         flash('Motorista cadastrado com sucesso!', 'success')
         return redirect(url_for('motorista', id=motorista_id))
         
+    except CpfDuplicado:
+        release_files(motorista['blobs'].values())
+        flash('CPF já cadastrado', 'error')
+        return redirect(url_for('cadastro'))
+    except ErroEnvio as e:
+        # Nada é salvo sem o arquivo que o usuário enviou
+        release_files(motorista['blobs'].values())
+        flash(str(e), 'error')
+        return redirect(url_for('cadastro'))
     except Exception as e:
         app.logger.error(f"Erro ao cadastrar motorista: {str(e)}")
         flash('Erro ao cadastrar motorista. Tente novamente.', 'error')
@@ -148,88 +159,81 @@ def motorista(id):
         return redirect(url_for('index'))
     
     # Verificar vencimentos
-    hoje = datetime.now().date()
     alertas = []
+    status = get_status_documentos(id)
+    if status['cnh'] == 'vencido':
+        alertas.append(('CNH vencida', 'danger'))
+    elif status['cnh'] == 'vencendo':
+        alertas.append(('CNH vence em breve', 'warning'))
+    if status['curso'] == 'vencido':
+        alertas.append(('Curso vencido', 'danger'))
+    elif status['curso'] == 'vencendo':
+        alertas.append(('Curso vence em breve', 'warning'))
     
-    if motorista.get('validade_cnh'):
-        try:
-            validade_cnh = datetime.strptime(motorista['validade_cnh'], '%Y-%m-%d').date()
-            if validade_cnh < hoje:
-                alertas.append(('CNH vencida', 'danger'))
-            elif validade_cnh <= hoje + timedelta(days=30):
-                alertas.append(('CNH vence em breve', 'warning'))
-        except ValueError:
-            pass
-    
-    if motorista.get('validade_curso'):
-        try:
-            validade_curso = datetime.strptime(motorista['validade_curso'], '%Y-%m-%d').date()
-            if validade_curso < hoje:
-                alertas.append(('Curso vencido', 'danger'))
-            elif validade_curso <= hoje + timedelta(days=30):
-                alertas.append(('Curso vence em breve', 'warning'))
-        except ValueError:
-            pass
-    
-    # Listar holerites
-    holerites_folder = os.path.join(app.config['UPLOAD_FOLDER'], id, 'holerites')
-    holerites = []
-    if os.path.exists(holerites_folder):
-        for year_folder in os.listdir(holerites_folder):
-            year_path = os.path.join(holerites_folder, year_folder)
-            if os.path.isdir(year_path):
-                for month_folder in os.listdir(year_path):
-                    month_path = os.path.join(year_path, month_folder)
-                    if os.path.isdir(month_path):
-                        for file in os.listdir(month_path):
-                            if file.endswith(('.pdf', '.png', '.jpg', '.jpeg')):
-                                holerites.append({
-                                    'ano': year_folder,
-                                    'mes': month_folder,
-                                    'arquivo': file,
-                                    'path': os.path.join(year_folder, month_folder, file)
-                                })
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+    holerites = get_holerites(motorista, pagina)
     
     return render_template('motorista.html', motorista=motorista, alertas=alertas, holerites=holerites)
 
 @app.route('/lista')
 def lista():
-    """Página de listagem de motoristas"""
-    motoristas = get_motoristas()
-    
-    # Adicionar informações de vencimento
+    """Página de listagem de motoristas (linhas carregadas via /motoristas)"""
+    return render_template('lista.html', total_motoristas=count_motoristas())
+
+@app.route('/proximos_vencimentos')
+def proximos_vencimentos():
+    """Próximos vencimentos de CNH e curso"""
+    limite = min(request.args.get('limite', 10, type=int), 100)
     hoje = datetime.now().date()
-    for motorista in motoristas:
-        # Garantir que o campo status existe
-        if 'status' not in motorista:
-            motorista['status'] = 'ativo'
-        if 'tipo_vinculo' not in motorista:
-            motorista['tipo_vinculo'] = 'registrado'
-            
-        motorista['status_cnh'] = 'ok'
-        motorista['status_curso'] = 'ok'
-        
-        if motorista.get('validade_cnh'):
-            try:
-                validade_cnh = datetime.strptime(motorista['validade_cnh'], '%Y-%m-%d').date()
-                if validade_cnh < hoje:
-                    motorista['status_cnh'] = 'vencido'
-                elif validade_cnh <= hoje + timedelta(days=30):
-                    motorista['status_cnh'] = 'vencendo'
-            except ValueError:
-                pass
-        
-        if motorista.get('validade_curso'):
-            try:
-                validade_curso = datetime.strptime(motorista['validade_curso'], '%Y-%m-%d').date()
-                if validade_curso < hoje:
-                    motorista['status_curso'] = 'vencido'
-                elif validade_curso <= hoje + timedelta(days=30):
-                    motorista['status_curso'] = 'vencendo'
-            except ValueError:
-                pass
+    resultado = []
+    for validade, id, documento in get_proximos_vencimentos(limite):
+        motorista = get_motorista_by_id(id)
+        if motorista:
+            resultado.append({
+                'id': id,
+                'nome': motorista.get('nome'),
+                'documento': documento,
+                'validade': validade.isoformat(),
+                'dias': (validade - hoje).days
+            })
+    return jsonify(resultado)
+
+@app.route('/avisos/vencimentos')
+def avisos_vencimentos():
+    """Último resumo diário de vencimentos (gerado pelo agendador)"""
+    resumo = get_expiry_digest()
+    if resumo is None:
+        return jsonify({'erro': 'Nenhum resumo gerado ainda'}), 404
+    return jsonify(resumo)
+
+@app.route('/motoristas')
+def motoristas():
+    """Listagem paginada, filtrada e ordenada de motoristas em JSON"""
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+    por_pagina = min(max(request.args.get('por_pagina', 25, type=int), 1), 100)
+    vencimento = request.args.get('vencimento')
+    if vencimento not in ('ok', 'vencendo', 'vencido'):
+        vencimento = None
     
-    return render_template('lista.html', motoristas=motoristas)
+    resultado = get_pagina_motoristas(
+        pagina=pagina,
+        por_pagina=por_pagina,
+        busca=request.args.get('q', '').strip(),
+        status=request.args.get('status'),
+        tipo_vinculo=request.args.get('tipo_vinculo'),
+        vencimento=vencimento,
+        ordenar=request.args.get('ordenar')
+    )
+    
+    for motorista in resultado['motoristas']:
+        motorista['foto_url'] = miniatura_url(motorista, 80) if motorista.get('arquivos', {}).get('foto') else None
+        motorista.pop('arquivos', None)
+        motorista.pop('blobs', None)
+    campos = campos_pedidos([])
+    if campos:
+        resultado['motoristas'] = [projetar(m, campos) for m in resultado['motoristas']]
+    
+    return jsonify(resultado)
 
 @app.route('/upload_holerite/<id>', methods=['POST'])
 def upload_holerite(id):
@@ -245,25 +249,45 @@ def upload_holerite(id):
         if not ano or not mes:
             return jsonify({'error': 'Ano e mês são obrigatórios'}), 400
         
-        if 'holerite' not in request.files:
+        # Arquivo já enviado em blocos (campo `token`) ou no próprio formulário
+        token = request.form.get('token')
+        envio = obter_envio(token) if token else None
+        if token and (not envio or not envio['chave']):
+            return jsonify({'error': 'Envio não encontrado ou incompleto'}), 400
+        
+        file = request.files.get('holerite')
+        if not envio and not file:
             return jsonify({'error': 'Nenhum arquivo enviado'}), 400
         
-        file = request.files['holerite']
-        if file.filename == '':
+        if not envio and file.filename == '':
             return jsonify({'error': 'Nenhum arquivo selecionado'}), 400
         
-        if file and allowed_file(file.filename):
-            # Criar pasta do holerite
-            holerite_folder = os.path.join(app.config['UPLOAD_FOLDER'], id, 'holerites', ano, mes)
-            os.makedirs(holerite_folder, exist_ok=True)
-            
-            extensao = file.filename.rsplit('.', 1)[1].lower()
+        nome_original = envio['nome'] if envio else file.filename
+        if allowed_file(nome_original):
+            extensao = nome_original.rsplit('.', 1)[1].lower()
             filename = f"holerite_{ano}_{mes}.{extensao}"
-            file_path = os.path.join(holerite_folder, filename)
-            file.save(file_path)
+            referencia = referencia_arquivo('holerite', f"{ano}/{mes}/{filename}")
+            if not referencia:
+                return jsonify({'error': 'Ano ou mês inválido'}), 400
+            
+            # Reenvio do mesmo mês substitui a referência; o blob anterior e a
+            # cópia na pasta antiga são apagados se não forem mais usados
+            caminho_antigo = resolver({'id': id}, referencia)
+            chave = consumir_envio(token, ALLOWED_EXTENSIONS) if envio else store_file(file, extensao)
+            if not chave:
+                return jsonify({'error': 'Envio não encontrado ou incompleto'}), 400
+            resultado = add_holerite(motorista, ano, mes, filename, chave)
+            if resultado is None:
+                release_files([chave])
+                return jsonify({'error': 'Motorista não encontrado'}), 404
+            entrada, anterior = resultado
+            if anterior:
+                release_files([anterior])
+            elif caminho_antigo and os.path.isfile(caminho_antigo):
+                os.remove(caminho_antigo)
             
-            app.logger.info(f"Holerite salvo: {file_path}")
-            return jsonify({'success': True, 'message': 'Holerite enviado com sucesso!'})
+            app.logger.info(f"Holerite salvo: {entrada['hash']}")
+            return jsonify({'success': True, 'message': 'Holerite enviado com sucesso!', 'holerite': entrada})
         
         return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
         
@@ -271,7 +295,132 @@ def upload_holerite(id):
         app.logger.error(f"Erro ao fazer upload do holerite: {str(e)}")
         return jsonify({'error': 'Erro interno do servidor'}), 500
 
-@app.route('/download_arquivo/<id>/<tipo>/<arquivo>')
+@app.route('/envios', methods=['POST'])
+def criar_envio():
+    """Iniciar envio em blocos de um arquivo (JSON: nome, tamanho e sha256 opcional)"""
+    dados = request.get_json(silent=True) or {}
+    nome = str(dados.get('nome') or '')
+    tamanho = dados.get('tamanho')
+    if not allowed_file(nome):
+        return jsonify({'error': 'Tipo de arquivo não permitido'}), 400
+    if not isinstance(tamanho, int):
+        return jsonify({'error': 'Tamanho é obrigatório'}), 400
+    try:
+        envio = iniciar_envio(secure_filename(nome) or nome, tamanho, dados.get('sha256'))
+    except ErroEnvio as e:
+        return jsonify({'error': str(e)}), e.status
+    envio['tamanho_bloco'] = TAMANHO_BLOCO
+    return jsonify(envio), 201
+
+@app.route('/envios/<token>')
+def estado_envio(token):
+    """Estado do envio em blocos (`recebido` indica de onde retomar)"""
+    envio = obter_envio(token)
+    if not envio:
+        return jsonify({'error': 'Envio não encontrado'}), 404
+    return jsonify(envio)
+
+@app.route('/envios/<token>', methods=['PUT'])
+def enviar_bloco(token):
+    """Receber um bloco do arquivo (corpo bruto) a partir de `offset`"""
+    offset = request.args.get('offset', type=int)
+    tamanho = request.content_length
+    if offset is None or tamanho is None:
+        return jsonify({'error': 'offset e Content-Length são obrigatórios'}), 400
+    try:
+        envio = receber_bloco(token, offset, request.stream, tamanho, request.headers.get('X-Checksum-Sha256'))
+    except ErroEnvio as e:
+        return jsonify({'error': str(e)}), e.status
+    except Exception as e:
+        app.logger.error(f"Erro ao receber bloco do envio {token}: {str(e)}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+    return jsonify(envio)
+
+@app.route('/motorista/<id>/holerites')
+def holerites_motorista(id):
+    """Holerites do motorista em JSON, do mais recente ao mais antigo, paginados"""
+    motorista = get_motorista_by_id(id)
+    if not motorista:
+        return jsonify({'error': 'Motorista não encontrado'}), 404
+    
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+    por_pagina = min(max(request.args.get('por_pagina', 12, type=int), 1), 100)
+    resultado = get_holerites(motorista, pagina, por_pagina)
+    resultado['holerites'] = [
+        dict(h, download_url=arquivo_url(motorista, 'holerite', h['path'])) for h in resultado['holerites']
+    ]
+    return jsonify(resultado)
+
+# Pastas de cada tipo de arquivo, relativas a uploads/<id>
+PASTAS_ARQUIVO = {'foto': '', 'documento': 'documentos', 'holerite': 'holerites'}
+
+# Arquivos com versão na URL nunca mudam de conteúdo: cache de 1 ano
+CACHE_IMUTAVEL = 365 * 24 * 3600
+
+def referencia_arquivo(tipo, arquivo):
+    """Caminho relativo a uploads/<id> (como em motorista['blobs']), ou None se inválido"""
+    if tipo not in PASTAS_ARQUIVO or not arquivo or safe_join('uploads', arquivo) is None:
+        return None
+    return posixpath.join(PASTAS_ARQUIVO[tipo], arquivo) if PASTAS_ARQUIVO[tipo] else arquivo
+
+def caminho_arquivo(motorista, tipo, arquivo):
+    """Caminho do arquivo do motorista, ou None se tipo/caminho inválido"""
+    referencia = referencia_arquivo(tipo, arquivo)
+    return resolver(motorista, referencia) if referencia else None
+
+def versao_arquivo(caminho):
+    """Identificador do conteúdo atual do arquivo (hash do blob, ou mtime e tamanho)"""
+    if caminho and versao_blob(caminho):
+        return versao_blob(caminho)[:16]
+    try:
+        st = os.stat(caminho)
+    except (OSError, TypeError):
+        return None
+    return f"{st.st_mtime_ns:x}{st.st_size:x}"
+
+@app.template_global()
+def arquivo_url(motorista, tipo, arquivo, inline=False):
+    """URL de download com a versão do arquivo, para cache de longa duração"""
+    params = {'id': motorista['id'], 'tipo': tipo, 'arquivo': arquivo}
+    versao = versao_arquivo(caminho_arquivo(motorista, tipo, arquivo))
+    if versao:
+        params['v'] = versao
+    if inline:
+        params['inline'] = 1
+    return url_for('download_arquivo', **params)
+
+@app.template_global()
+def miniatura_url(motorista, tamanho):
+    """URL da miniatura com a versão da foto original"""
+    id = motorista['id']
+    versao = versao_arquivo(caminho_arquivo(motorista, 'foto', motorista['arquivos']['foto']))
+    return url_for('miniatura', id=id, tamanho=tamanho, v=versao) if versao else url_for('miniatura', id=id, tamanho=tamanho)
+
+def enviar_com_cache(file_path, versao_atual=None, **kwargs):
+    """send_file com validadores (ETag, Last-Modified, Range) e política de cache.
+
+    Com `v` igual à versão atual do arquivo (ou de `versao_atual`, quando o
+    arquivo deriva de outro) a resposta é imutável; sem versão o navegador
+    revalida a cada uso e recebe 304 se nada mudou.
+    """
+    versao = request.args.get('v')
+    # Blobs já têm o hash do conteúdo no nome, que serve de ETag
+    etag = versao_blob(file_path) or True
+    if versao and versao == (versao_atual or versao_arquivo(file_path)):
+        response = send_file(file_path, conditional=True, etag=etag, max_age=CACHE_IMUTAVEL, **kwargs)
+        response.cache_control.public = True
+        response.cache_control.immutable = True
+    else:
+        response = send_file(file_path, conditional=True, etag=etag, max_age=0, **kwargs)
+        response.cache_control.no_cache = True
+    return response
+
+def contar_bytes(response, tipo):
+    """Somar às métricas os bytes do arquivo enviado (parcial em pedidos com Range)"""
+    if response.status_code in (200, 206):
+        metricas.arquivos_bytes.inc(response.content_length or 0, tipo)
+
+@app.route('/download_arquivo/<id>/<tipo>/<path:arquivo>')
 def download_arquivo(id, tipo, arquivo):
     """Download de arquivo"""
     try:
@@ -280,18 +429,18 @@ def download_arquivo(id, tipo, arquivo):
             flash('Motorista não encontrado', 'error')
             return redirect(url_for('index'))
         
-        if tipo == 'foto':
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], id, arquivo)
-        elif tipo == 'documento':
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], id, 'documentos', arquivo)
-        elif tipo == 'holerite':
-            file_path = os.path.join(app.config['UPLOAD_FOLDER'], id, 'holerites', arquivo)
-        else:
+        if tipo not in PASTAS_ARQUIVO:
             flash('Tipo de arquivo inválido', 'error')
             return redirect(url_for('motorista', id=id))
         
-        if os.path.exists(file_path):
-            return send_file(file_path, as_attachment=True)
+        file_path = caminho_arquivo(motorista, tipo, arquivo)
+        if file_path and os.path.isfile(file_path):
+            # Imagens podem ser exibidas no navegador em vez de baixadas
+            extensao = file_path.rsplit('.', 1)[-1].lower()
+            inline = request.args.get('inline') == '1' or (tipo == 'foto' and extensao != 'pdf')
+            response = enviar_com_cache(file_path, as_attachment=not inline, download_name=posixpath.basename(arquivo))
+            contar_bytes(response, tipo)
+            return response
         else:
             flash('Arquivo não encontrado', 'error')
             return redirect(url_for('motorista', id=id))
@@ -301,41 +450,136 @@ def download_arquivo(id, tipo, arquivo):
         flash('Erro ao fazer download do arquivo', 'error')
         return redirect(url_for('motorista', id=id))
 
+@app.route('/miniatura/<id>/<int:tamanho>')
+def miniatura(id, tamanho):
+    """Miniatura quadrada da foto do motorista"""
+    motorista = get_motorista_by_id(id)
+    foto = motorista.get('arquivos', {}).get('foto') if motorista else None
+    if not foto:
+        return jsonify({'error': 'Foto não encontrada'}), 404
+    
+    foto_path = caminho_arquivo(motorista, 'foto', foto)
+    if not foto_path or not os.path.exists(foto_path):
+        return jsonify({'error': 'Foto não encontrada'}), 404
+    
+    # A versão na URL é a da foto original, da qual a miniatura deriva
+    response = enviar_com_cache(obter_miniatura(foto_path, tamanho), versao_atual=versao_arquivo(foto_path))
+    contar_bytes(response, 'miniatura')
+    return response
+
+def formato_backup():
+    formato = request.args.get('formato', 'zip')
+    return formato if formato in ('zip', 'tar') else 'zip'
+
 @app.route('/backup')
 def backup():
-    """Criar backup dos dados"""
+    """Criar backup dos dados em segundo plano"""
     try:
-        backup_path = create_backup()
-        flash('Backup criado com sucesso! O arquivo será baixado automaticamente.', 'success')
-        
-        # Enviar arquivo e limpar após download
-        def remove_file(response):
-            try:
-                if os.path.exists(backup_path):
-                    os.remove(backup_path)
-                    app.logger.info(f"Arquivo de backup removido: {backup_path}")
-            except Exception as e:
-                app.logger.error(f"Erro ao remover arquivo de backup: {str(e)}")
-            return response
-        
-        return send_file(backup_path, as_attachment=True, download_name=os.path.basename(backup_path))
+        tarefa_id = start_backup(formato_backup(), request.args.get('incremental') == '1')
+        return redirect(url_for('tarefa', id=tarefa_id))
+    except Exception as e:
+        app.logger.error(f"Erro ao criar backup: {str(e)}")
+        flash('Erro ao criar backup', 'error')
+        return redirect(url_for('index'))
+
+@app.route('/backup/download')
+def backup_download():
+    """Backup enviado enquanto é gerado (para scripts)"""
+    try:
+        backup_name, mimetype, gerador = stream_backup(formato_backup(), request.args.get('incremental') == '1')
+        return Response(
+            stream_with_context(gerador),
+            mimetype=mimetype,
+            headers={'Content-Disposition': f'attachment; filename="{backup_name}"'}
+        )
     except Exception as e:
         app.logger.error(f"Erro ao criar backup: {str(e)}")
         flash('Erro ao criar backup', 'error')
         return redirect(url_for('index'))
 
+@app.route('/tarefa/<id>')
+def tarefa(id):
+    """Página de acompanhamento de uma tarefa de segundo plano"""
+    if not obter_tarefa(id):
+        flash('Tarefa não encontrada', 'error')
+        return redirect(url_for('index'))
+    return render_template('tarefa.html', tarefa_id=id)
+
+@app.route('/tarefas/<id>')
+def tarefa_status(id):
+    """Status e progresso da tarefa em JSON"""
+    tarefa = obter_tarefa(id)
+    if not tarefa:
+        return jsonify({'error': 'Tarefa não encontrada'}), 404
+    if tarefa['status'] == 'concluida' and tarefa['tipo'] == 'backup':
+        tarefa['download_url'] = url_for('tarefa_download', id=id)
+    return jsonify(tarefa)
+
+@app.route('/tarefas/<id>/download')
+def tarefa_download(id):
+    """Arquivo gerado por uma tarefa de backup concluída"""
+    tarefa = obter_tarefa(id)
+    if not tarefa or tarefa['status'] != 'concluida' or tarefa['tipo'] != 'backup':
+        flash('Backup não disponível', 'error')
+        return redirect(url_for('index'))
+    
+    file_path = safe_join(PASTA_MANIFESTOS, tarefa['resultado']['arquivo'])
+    if not file_path or not os.path.exists(file_path):
+        flash('Arquivo de backup não encontrado', 'error')
+        return redirect(url_for('index'))
+    return send_file(file_path, as_attachment=True)
+
+@app.route('/importar', methods=['POST'])
+def importar():
+    """Importar motoristas em lote de um arquivo CSV ou JSONL"""
+    try:
+        arquivo = request.files.get('arquivo')
+        if not arquivo or not arquivo.filename:
+            return jsonify({'error': 'Nenhum arquivo enviado'}), 400
+        
+        formato = request.form.get('formato') or formato_do_arquivo(arquivo.filename)
+        if formato not in FORMATOS_IMPORTACAO:
+            return jsonify({'error': 'Formato inválido (use csv ou jsonl)'}), 400
+        
+        return jsonify(import_motoristas(arquivo.stream, formato))
+    except Exception as e:
+        app.logger.error(f"Erro ao importar motoristas: {str(e)}")
+        return jsonify({'error': 'Erro interno do servidor'}), 500
+
+@app.route('/exportar')
+def exportar():
+    """Exportar todos os motoristas em CSV ou JSONL, enviado aos poucos"""
+    formato = request.args.get('formato', 'csv')
+    if formato not in FORMATOS_IMPORTACAO:
+        formato = 'csv'
+    nome = f"motoristas_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{formato}"
+    return Response(
+        stream_with_context(export_motoristas(formato)),
+        mimetype=FORMATOS_IMPORTACAO[formato],
+        headers={'Content-Disposition': f'attachment; filename="{nome}"'}
+    )
+
+@app.route('/metrics')
+def metrics():
+    """Métricas no formato do Prometheus (somente para a própria máquina)"""
+    if request.remote_addr not in ('127.0.0.1', '::1'):
+        return jsonify({'error': 'Acesso permitido apenas localmente'}), 403
+    return Response(metricas.exportar(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/buscar')
 def buscar():
     """Buscar motoristas"""
-    query = request.args.get('q', '').lower()
-    motoristas = get_motoristas()
+    query = request.args.get('q', '')
+    limite = min(max(request.args.get('limite', 20, type=int), 1), 500)
+    campos = campos_pedidos(CAMPOS_BUSCA)
     
-    if query:
-        motoristas = [m for m in motoristas if 
-                     query in m.get('nome', '').lower() or 
-                     query in m.get('cpf', '')]
+    resultado = []
+    for id in search_motoristas(query, limite):
+        motorista = get_motorista_by_id(id)
+        if motorista:
+            resultado.append(projetar(motorista, campos))
     
-    return jsonify(motoristas)
+    return jsonify(resultado)
 
 @app.route('/toggle_status/<id>', methods=['POST'])
 def toggle_status(id):
@@ -351,9 +595,8 @@ def toggle_status(id):
         if novo_status not in ['ativo', 'inativo']:
             return jsonify({'error': 'Status inválido'}), 400
         
-        motorista['status'] = novo_status
-        
-        if save_motorista(motorista):
+        # Só o status é gravado, sobre o registro mais recente
+        if update_motorista(id, {'status': novo_status}):
             acao = 'ativado' if novo_status == 'ativo' else 'desativado'
             app.logger.info(f"Motorista {motorista['nome']} {acao}")
             return jsonify({'success': True, 'message': f'Motorista {acao} com sucesso!'})
@@ -378,12 +621,10 @@ def delete_motorista(id):
             shutil.rmtree(motorista_folder)
             app.logger.info(f"Pasta do motorista excluída: {motorista_folder}")
         
-        # Remover do JSON
-        motoristas = get_motoristas()
-        motoristas = [m for m in motoristas if m['id'] != id]
-        
-        with open('data/motoristas.json', 'w', encoding='utf-8') as f:
-            json.dump(motoristas, f, indent=2, ensure_ascii=False)
+        # Remover do cadastro e apagar os blobs que só ele usava
+        if not remove_motorista(id):
+            return jsonify({'error': 'Erro ao excluir motorista'}), 500
+        release_files(motorista.get('blobs', {}).values())
         
         app.logger.info(f"Motorista {motorista['nome']} excluído permanentemente")
         return jsonify({'success': True, 'message': 'Motorista excluído com sucesso!'})
@@ -94,9 +94,9 @@ function setupFileValidation() {
         input.addEventListener('change', function(e) {
             const file = e.target.files[0];
             if (file) {
-                // Validar tamanho do arquivo (máximo 16MB)
-                if (file.size > 16 * 1024 * 1024) {
-                    alert('Arquivo muito grande. Tamanho máximo permitido: 16MB');
+                // Validar tamanho do arquivo (máximo 200MB, enviado em blocos)
+                if (file.size > 200 * 1024 * 1024) {
+                    alert('Arquivo muito grande. Tamanho máximo permitido: 200MB');
                     e.target.value = '';
                     return;
                 }
@@ -238,6 +238,13 @@ function showNotification(message, type = 'info') {
     }, 5000);
 }
 
+// Função para escapar texto antes de inserir em HTML
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text == null ? '' : String(text);
+    return div.innerHTML;
+}
+
 // Função para copiar texto para clipboard
 function copyToClipboard(text) {
     navigator.clipboard.writeText(text).then(() => {
@@ -294,3 +301,69 @@ window.addEventListener('scroll', function() {
         }
     }
 });
+
+// Envio de arquivos em blocos, com retomada após falhas
+async function sha256Hex(dados) {
+    // crypto.subtle só existe em contextos seguros (https ou localhost)
+    if (!window.crypto || !window.crypto.subtle) {
+        return null;
+    }
+    const hash = await window.crypto.subtle.digest('SHA-256', dados);
+    return Array.from(new Uint8Array(hash)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+async function enviarEmBlocos(file, onProgress) {
+    let response = await fetch('/envios', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ nome: file.name, tamanho: file.size })
+    });
+    let envio = await response.json();
+    if (!response.ok) {
+        throw new Error(envio.error || 'Erro ao iniciar envio');
+    }
+    
+    const tamanhoBloco = envio.tamanho_bloco;
+    let falhas = 0;
+    while (!envio.chave) {
+        const fim = Math.min(envio.recebido + tamanhoBloco, file.size);
+        const bloco = await file.slice(envio.recebido, fim).arrayBuffer();
+        const headers = { 'Content-Type': 'application/octet-stream' };
+        const checksum = await sha256Hex(bloco);
+        if (checksum) {
+            headers['X-Checksum-Sha256'] = checksum;
+        }
+        
+        let enviado = false;
+        try {
+            response = await fetch(`/envios/${envio.token}?offset=${envio.recebido}`, {
+                method: 'PUT', headers: headers, body: bloco
+            });
+            if (response.ok) {
+                envio = await response.json();
+                enviado = true;
+                falhas = 0;
+            } else if (response.status === 400 || response.status === 404) {
+                throw new Error((await response.json()).error);
+            }
+        } catch (error) {
+            // TypeError indica falha de rede: tenta de novo
+            if (!(error instanceof TypeError)) {
+                throw error;
+            }
+        }
+        
+        if (!enviado) {
+            if (++falhas > 5) {
+                throw new Error('Falha ao enviar arquivo');
+            }
+            await new Promise(resolve => setTimeout(resolve, 1000 * falhas));
+            // Retoma do que o servidor confirmou ter recebido
+            envio = await (await fetch(`/envios/${envio.token}`)).json();
+        }
+        if (onProgress) {
+            onProgress(Math.round(100 * envio.recebido / Math.max(file.size, 1)));
+        }
+    }
+    return envio.token;
+}
@@ -0,0 +1,117 @@
+import os
+import json
+import uuid
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from app import app
+from repositorio import gravar_atomico
+
+PASTA_TAREFAS = 'data/tarefas'
+
+# Quantidade de tarefas encerradas (concluídas ou com erro) mantidas em disco
+TAREFAS_MANTIDAS = 50
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='tarefa')
+_lock = threading.Lock()
+
+
+def _caminho(id):
+    return os.path.join(PASTA_TAREFAS, f"{id}.json")
+
+
+def _gravar(tarefa):
+    os.makedirs(PASTA_TAREFAS, exist_ok=True)
+    gravar_atomico(_caminho(tarefa['id']), lambda f: json.dump(tarefa, f, indent=2, ensure_ascii=False))
+
+
+def _processo_ativo(pid):
+    if os.name == 'nt':
+        # No Windows os.kill encerraria o processo; assume ativo
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def obter_tarefa(id):
+    """Estado da tarefa (de qualquer worker), ou None"""
+    try:
+        with open(_caminho(id), 'r', encoding='utf-8') as f:
+            tarefa = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if tarefa['status'] in ('pendente', 'executando') and not _processo_ativo(tarefa['pid']):
+        tarefa['status'] = 'erro'
+        tarefa['mensagem'] = 'Tarefa interrompida: o processo que a executava foi encerrado'
+    return tarefa
+
+
+def _limpar():
+    """Remover os arquivos das tarefas encerradas mais antigas"""
+    encerradas = []
+    for nome in os.listdir(PASTA_TAREFAS):
+        if not nome.endswith('.json'):
+            continue
+        tarefa = obter_tarefa(nome[:-len('.json')])
+        if tarefa and tarefa['status'] in ('concluida', 'erro'):
+            encerradas.append((tarefa['concluida_em'] or tarefa['criada_em'], nome))
+    encerradas.sort()
+    for _, antigo in encerradas[:-TAREFAS_MANTIDAS]:
+        try:
+            os.remove(os.path.join(PASTA_TAREFAS, antigo))
+        except FileNotFoundError:  # Removido por outro worker
+            pass
+
+
+def enfileirar(tipo, funcao, *args):
+    """Executar `funcao(progresso, *args)` em segundo plano; retorna o ID da tarefa.
+
+    `progresso(percentual, mensagem)` atualiza o estado persistido da tarefa;
+    o valor retornado pela função é guardado em `resultado`.
+    """
+    tarefa = {
+        'id': str(uuid.uuid4()),
+        'tipo': tipo,
+        'status': 'pendente',
+        'progresso': 0,
+        'mensagem': '',
+        'resultado': None,
+        'pid': os.getpid(),
+        'criada_em': datetime.now().isoformat(),
+        'concluida_em': None
+    }
+    _gravar(tarefa)
+
+    def progresso(percentual, mensagem=''):
+        with _lock:
+            tarefa['progresso'] = int(percentual)
+            tarefa['mensagem'] = mensagem
+            _gravar(tarefa)
+
+    def executar():
+        with _lock:
+            tarefa['status'] = 'executando'
+            _gravar(tarefa)
+        try:
+            resultado = funcao(progresso, *args)
+            with _lock:
+                tarefa.update(status='concluida', progresso=100, resultado=resultado)
+        except Exception as e:
+            app.logger.error(f"Erro na tarefa {tipo} {tarefa['id']}: {str(e)}")
+            with _lock:
+                tarefa.update(status='erro', mensagem=str(e))
+        with _lock:
+            tarefa['concluida_em'] = datetime.now().isoformat()
+            _gravar(tarefa)
+        try:
+            _limpar()
+        except OSError as e:
+            app.logger.error(f"Erro ao remover tarefas antigas: {str(e)}")
+
+    _executor.submit(executar)
+    return tarefa['id']
@@ -1,122 +1,309 @@
-import os
-import json
-import shutil
 import re
+import uuid
 from datetime import datetime
 from app import app
+from repositorio import criar_repositorio
+from vencimentos import IndiceVencimentos
+from estatisticas import CacheEstatisticas
+from listagem import IndiceListagem
+from busca import IndiceBusca
+from armazenamento import ContagemReferencias, caminho_blob, salvar_blob, remover_orfaos, resolver
+from holerites import criar_entrada, indexar, paginar, registrar
+from importacao import CAMPOS, exportar, ler_linhas
+from avisos import Alteracoes, gerar_resumo, ultimo_resumo
+from validacao import auditar, cpf_valido, formatar_telefone, validar_cpfs, validar_telefones
+from backup import FORMATOS, gerar_backup, criar_backup_arquivo
+from tarefas import enfileirar
 
 DATA_FILE = 'data/motoristas.json'
 
+repositorio = criar_repositorio(DATA_FILE)
+indice_vencimentos = IndiceVencimentos()
+repositorio.assinar(indice_vencimentos)
+cache_estatisticas = CacheEstatisticas(indice_vencimentos)
+repositorio.assinar(cache_estatisticas)
+indice_listagem = IndiceListagem()
+repositorio.assinar(indice_listagem)
+indice_busca = IndiceBusca()
+repositorio.assinar(indice_busca)
+contagem_blobs = ContagemReferencias()
+repositorio.assinar(contagem_blobs)
+alteracoes_vencimentos = Alteracoes()
+repositorio.assinar(alteracoes_vencimentos)
+
 def validate_cpf(cpf):
     """Validar CPF brasileiro"""
-    cpf = re.sub(r'[^0-9]', '', cpf)
-    
-    if len(cpf) != 11 or cpf == cpf[0] * 11:
-        return False
-    
-    # Validar primeiro dígito
-    soma = sum(int(cpf[i]) * (10 - i) for i in range(9))
-    resto = soma % 11
-    digito1 = 0 if resto < 2 else 11 - resto
-    
-    if int(cpf[9]) != digito1:
-        return False
-    
-    # Validar segundo dígito
-    soma = sum(int(cpf[i]) * (11 - i) for i in range(10))
-    resto = soma % 11
-    digito2 = 0 if resto < 2 else 11 - resto
-    
-    return int(cpf[10]) == digito2
+    return cpf_valido(re.sub(r'[^0-9]', '', cpf))
 
 def format_phone(phone):
     """Formatar telefone brasileiro"""
-    phone = re.sub(r'[^0-9]', '', phone)
-    if len(phone) == 11:
-        return f"({phone[:2]}) {phone[2:7]}-{phone[7:]}"
-    elif len(phone) == 10:
-        return f"({phone[:2]}) {phone[2:6]}-{phone[6:]}"
-    return phone
+    return formatar_telefone(re.sub(r'[^0-9]', '', phone))
+
+def audit_motoristas():
+    """CPFs inválidos ou duplicados e celulares fora do padrão no cadastro"""
+    return auditar(get_motoristas())
 
 def get_motoristas():
     """Obter lista de motoristas"""
-    try:
-        if os.path.exists(DATA_FILE):
-            with open(DATA_FILE, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        return []
-    except Exception as e:
-        app.logger.error(f"Erro ao carregar motoristas: {str(e)}")
-        return []
+    return repositorio.listar()
+
+def count_motoristas():
+    """Obter total de motoristas"""
+    return repositorio.contar()
 
 def save_motorista(motorista):
     """Salvar motorista"""
     try:
-        motoristas = get_motoristas()
-        
-        # Verificar se é atualização ou novo cadastro
-        existing_index = None
-        for i, m in enumerate(motoristas):
-            if m['id'] == motorista['id']:
-                existing_index = i
-                break
-        
-        if existing_index is not None:
-            motoristas[existing_index] = motorista
-        else:
-            motoristas.append(motorista)
-        
-        with open(DATA_FILE, 'w', encoding='utf-8') as f:
-            json.dump(motoristas, f, indent=2, ensure_ascii=False)
-        
+        repositorio.salvar(motorista)
         return True
     except Exception as e:
         app.logger.error(f"Erro ao salvar motorista: {str(e)}")
         return False
 
+def create_motorista(motorista):
+    """Incluir motorista novo; CpfDuplicado se o CPF já estiver cadastrado"""
+    repositorio.inserir(motorista)
+
 def get_motorista_by_id(id):
     """Obter motorista por ID"""
-    motoristas = get_motoristas()
-    for motorista in motoristas:
-        if motorista['id'] == id:
-            return motorista
-    return None
+    return repositorio.obter(id)
+
+def get_motorista_by_cpf(cpf):
+    """Obter motorista por CPF"""
+    return repositorio.obter_por_cpf(cpf)
+
+def get_status_documentos(id):
+    """Status ('ok', 'vencendo', 'vencido') de CNH e curso do motorista"""
+    repositorio.sincronizar()
+    return indice_vencimentos.status(id, datetime.now().date())
+
+def get_estatisticas():
+    """Estatísticas do painel (totais e documentos vencidos/vencendo)"""
+    repositorio.sincronizar()
+    return cache_estatisticas.obter(datetime.now().date())
+
+def get_proximos_vencimentos(limite=10):
+    """Próximos vencimentos de documentos, do mais próximo ao mais distante"""
+    repositorio.sincronizar()
+    return indice_vencimentos.proximos(datetime.now().date(), limite)
+
+def generate_expiry_digest(forcar=False):
+    """Gerar o resumo diário de vencimentos em data/outbox (None se já gerado hoje ou vazio)"""
+    with app.app_context():
+        repositorio.sincronizar()
+        return gerar_resumo(indice_vencimentos, alteracoes_vencimentos, repositorio.obter,
+                            datetime.now().date(), forcar=forcar)
+
+def get_expiry_digest():
+    """Último resumo de vencimentos gerado, ou None"""
+    return ultimo_resumo()
+
+def search_motoristas(consulta, limite=None):
+    """IDs dos motoristas que casam com a busca por nome ou CPF, por relevância"""
+    repositorio.sincronizar()
+    if not consulta.strip():
+        return indice_listagem.filtrar()[:limite]
+    return indice_busca.buscar(consulta, limite)
+
+def get_pagina_motoristas(pagina=1, por_pagina=25, busca=None, status=None, tipo_vinculo=None, vencimento=None, ordenar=None):
+    """Página de motoristas filtrada e ordenada, com status dos documentos"""
+    repositorio.sincronizar()
+    hoje = datetime.now().date()
+    ids = set(indice_busca.buscar(busca)) if busca else None
+    aceitar = None
+    if vencimento:
+        aceitar = lambda id: vencimento in indice_vencimentos.status(id, hoje).values()
+    decrescente = bool(ordenar) and ordenar.startswith('-')
+    ids_filtrados = indice_listagem.filtrar(status, tipo_vinculo, ids, aceitar, (ordenar or '').lstrip('-'), decrescente)
+    
+    inicio = (pagina - 1) * por_pagina
+    motoristas = []
+    for id in ids_filtrados[inicio:inicio + por_pagina]:
+        motorista = repositorio.obter(id)
+        if motorista:
+            motorista.setdefault('status', 'ativo')
+            motorista.setdefault('tipo_vinculo', 'registrado')
+            documentos = indice_vencimentos.status(id, hoje)
+            motorista['status_cnh'] = documentos['cnh']
+            motorista['status_curso'] = documentos['curso']
+            motoristas.append(motorista)
+    
+    total = len(ids_filtrados)
+    return {
+        'motoristas': motoristas,
+        'total': total,
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'paginas': (total + por_pagina - 1) // por_pagina
+    }
 
 def update_motorista(id, dados):
-    """Atualizar motorista"""
-    motorista = get_motorista_by_id(id)
-    if motorista:
-        motorista.update(dados)
-        return save_motorista(motorista)
-    return False
-
-def create_backup():
-    """Criar backup completo dos dados"""
+    """Atualizar campos do motorista sobre o registro mais recente.
+
+    Retorna o motorista atualizado, ou None se não existir ou der erro.
+    """
     try:
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        backup_name = f"backup_es_turismo_{timestamp}"
-        backup_path = f"{backup_name}.zip"
-        
-        # Criar diretório temporário para o backup
-        backup_dir = f"temp_backup_{timestamp}"
-        os.makedirs(backup_dir, exist_ok=True)
-        
-        # Copiar arquivos de dados
-        if os.path.exists(DATA_FILE):
-            shutil.copy2(DATA_FILE, os.path.join(backup_dir, 'motoristas.json'))
-        
-        # Copiar uploads
-        if os.path.exists('uploads'):
-            shutil.copytree('uploads', os.path.join(backup_dir, 'uploads'))
-        
-        # Criar arquivo ZIP
-        shutil.make_archive(backup_name, 'zip', backup_dir)
-        
-        # Limpar diretório temporário
-        shutil.rmtree(backup_dir)
-        
-        app.logger.info(f"Backup criado: {backup_path}")
-        return backup_path
+        return repositorio.atualizar(id, dados)
     except Exception as e:
-        app.logger.error(f"Erro ao criar backup: {str(e)}")
-        raise e
+        app.logger.error(f"Erro ao atualizar motorista: {str(e)}")
+        return None
+
+def remove_motorista(id):
+    """Remover motorista"""
+    try:
+        return repositorio.remover(id)
+    except Exception as e:
+        app.logger.error(f"Erro ao remover motorista: {str(e)}")
+        return False
+
+def store_file(arquivo, extensao):
+    """Gravar arquivo enviado no repositório de blobs; retorna a chave do blob"""
+    return salvar_blob(arquivo, extensao)
+
+def release_files(chaves):
+    """Apagar os blobs que deixaram de ser referenciados por algum motorista"""
+    try:
+        repositorio.sincronizar()
+        return remover_orfaos(chaves, contagem_blobs)
+    except Exception as e:
+        app.logger.error(f"Erro ao remover arquivos sem referência: {str(e)}")
+        return 0
+
+def index_holerites(motorista):
+    """Metadados dos holerites do motorista, do mais recente ao mais antigo.
+
+    Só leitura: cadastros anteriores ao índice são listados a partir dos
+    arquivos, sem calcular o hash; o índice é salvo por `flask
+    indexar-holerites` ou no próximo envio de holerite (`add_holerite`).
+    """
+    if 'holerites' in motorista:
+        return motorista['holerites']
+    return indexar(motorista, resolver, app.config['UPLOAD_FOLDER'], calcular_hash=False)
+
+def get_holerites(motorista, pagina=1, por_pagina=12):
+    """Página de holerites do motorista"""
+    return paginar(index_holerites(motorista), pagina, por_pagina)
+
+def add_holerite(motorista, ano, mes, arquivo, chave):
+    """Registrar o holerite gravado no blob `chave` e salvar o motorista.
+
+    A alteração é aplicada sobre o registro mais recente, sob a trava de
+    escrita. Retorna (entrada, chave do blob substituído ou None), ou None se
+    o motorista não existir mais.
+    """
+    referencia = f"holerites/{ano}/{mes}/{arquivo}"
+    entrada = criar_entrada(ano, mes, arquivo, caminho_blob(chave),
+                            hash=chave.split('.', 1)[0], enviado_em=datetime.now().isoformat())
+    # Cadastro anterior ao índice: indexado (com hash) e salvo junto com o envio
+    holerites = motorista.get('holerites')
+    if holerites is None:
+        holerites = indexar(motorista, resolver, app.config['UPLOAD_FOLDER'])
+    substituido = []
+
+    def alterar(atual):
+        blobs = atual.setdefault('blobs', {})
+        substituido.append(blobs.get(referencia))
+        blobs[referencia] = chave
+        registrar(atual.setdefault('holerites', list(holerites)), entrada)
+
+    if repositorio.atualizar(motorista['id'], alterar) is None:
+        return None
+    return entrada, substituido[0]
+
+def import_motoristas(arquivo, formato='csv'):
+    """Importar motoristas de um arquivo CSV/JSONL numa única gravação.
+
+    Cada linha é validada (nome, CPF válido, CPF não cadastrado nem repetido
+    no arquivo) e incluída como em `create_motorista`; retorna {'importados': n, 'rejeitados': [{'linha', 'cpf', 'motivo'}]}.
+    """
+    # CPFs e celulares do arquivo inteiro são validados de uma vez
+    linhas = list(ler_linhas(arquivo, formato))
+    cpfs_validos, cpfs_normalizados = validar_cpfs([str(d.get('cpf') or '') if d else '' for _, d in linhas])
+    _, celulares = validar_telefones([str(d.get('celular') or '') if d else '' for _, d in linhas])
+    cpfs = repositorio.cpfs()
+    cpfs_arquivo = set()
+    agora = datetime.now().isoformat()
+    ids = set()
+    motoristas = []
+    numeros = []
+    rejeitados = []
+    for (numero, dados), cpf, cpf_ok, celular in zip(linhas, cpfs_normalizados, cpfs_validos, celulares):
+        if dados is None:
+            rejeitados.append({'linha': numero, 'cpf': None, 'motivo': 'Linha ilegível'})
+            continue
+        motivo = None
+        if not str(dados.get('nome') or '').strip():
+            motivo = 'Nome obrigatório'
+        elif not cpf_ok:
+            motivo = 'CPF inválido'
+        elif cpf in cpfs:
+            motivo = 'CPF já cadastrado'
+        elif cpf in cpfs_arquivo:
+            motivo = 'CPF repetido no arquivo'
+        elif dados.get('tipo_vinculo') and dados['tipo_vinculo'] not in ('registrado', 'freelancer'):
+            motivo = 'Tipo de vínculo inválido'
+        elif dados.get('status') and dados['status'] not in ('ativo', 'inativo'):
+            motivo = 'Status inválido'
+        if motivo:
+            rejeitados.append({'linha': numero, 'cpf': cpf or None, 'motivo': motivo})
+            continue
+        
+        cpfs_arquivo.add(cpf)
+        motorista = {campo: str(dados[campo]).strip() for campo in CAMPOS if dados.get(campo)}
+        # O ID do arquivo é mantido (restauração de exportação) se for um UUID
+        # na forma canônica e estiver livre; ele vira nome de pasta em uploads/
+        try:
+            id_valido = str(uuid.UUID(motorista.get('id', ''))) == motorista['id']
+        except ValueError:
+            id_valido = False
+        if not id_valido or motorista['id'] in ids or get_motorista_by_id(motorista['id']):
+            motorista['id'] = str(uuid.uuid4())
+        ids.add(motorista['id'])
+        motorista.update({
+            'cpf': cpf,
+            'celular': celular,
+            'tipo_vinculo': motorista.get('tipo_vinculo', 'registrado'),
+            'status': motorista.get('status', 'ativo'),
+            'data_cadastro': motorista.get('data_cadastro', agora),
+            'arquivos': {},
+            'blobs': {},
+            'holerites': []
+        })
+        motoristas.append(motorista)
+        numeros.append(numero)
+    
+    # O CPF é conferido de novo sob a trava de escrita: um cadastro feito
+    # durante a importação recusa só a linha em conflito
+    recusas = repositorio.inserir_varios(motoristas)
+    for numero, motorista, recusa in zip(numeros, motoristas, recusas):
+        if recusa:
+            rejeitados.append({'linha': numero, 'cpf': motorista['cpf'], 'motivo': 'CPF já cadastrado'})
+    rejeitados.sort(key=lambda r: r['linha'])
+    importados = len(motoristas) - sum(1 for recusa in recusas if recusa)
+    app.logger.info(f"Importação: {importados} motoristas importados, {len(rejeitados)} linhas rejeitadas")
+    return {'importados': importados, 'rejeitados': rejeitados}
+
+def export_motoristas(formato='csv'):
+    """Gerador com os motoristas exportados em CSV ou JSONL"""
+    return exportar(get_motoristas(), formato)
+
+def nome_backup(formato='zip', incremental=False):
+    """Nome do arquivo de backup"""
+    extensao = FORMATOS[formato][1]
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    sufixo = '_incremental' if incremental else ''
+    return f"backup_es_turismo_{timestamp}{sufixo}.{extensao}"
+
+def start_backup(formato='zip', incremental=False):
+    """Enfileirar backup em segundo plano; retorna o ID da tarefa"""
+    nome = nome_backup(formato, incremental)
+    app.logger.info(f"Backup enfileirado: {nome}")
+    return enfileirar('backup', criar_backup_arquivo, nome, get_motoristas(), app.config['UPLOAD_FOLDER'], formato, incremental)
+
+def stream_backup(formato='zip', incremental=False):
+    """Backup dos dados e uploads: (nome do arquivo, mimetype, gerador de blocos)"""
+    mimetype = FORMATOS[formato][0]
+    backup_name = nome_backup(formato, incremental)
+    gerador = gerar_backup(get_motoristas(), app.config['UPLOAD_FOLDER'], formato, incremental)
+    app.logger.info(f"Backup iniciado: {backup_name}")
+    return backup_name, mimetype, gerador
@@ -0,0 +1,133 @@
+import re
+from collections import defaultdict
+
+# Lotes grandes (importações, auditoria do cadastro) calculam os dígitos
+# verificadores com NumPy, se instalado; abaixo disso o custo de montar os
+# arrays supera o ganho e o cálculo em Python puro dá o mesmo resultado
+LIMIAR_NUMPY = 256
+
+_NAO_DIGITOS = re.compile(r'[^0-9]')
+
+# Pesos dos dois dígitos verificadores
+_PESOS1 = tuple(range(10, 1, -1))
+_PESOS2 = tuple(range(11, 1, -1))
+
+# NumPy é importado só no primeiro lote grande (acelera a inicialização)
+_numpy = None
+
+
+def numpy():
+    """Módulo numpy, ou None se não estiver instalado"""
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy as np
+            _numpy = np
+        except ImportError:  # Laços em Python puro
+            _numpy = False
+    return _numpy or None
+
+
+def somente_digitos(valores):
+    """Valores sem nada além dos dígitos (None vira ''; números de registros
+    antigos são convertidos para texto)"""
+    return [_NAO_DIGITOS.sub('', str(valor)) if valor else '' for valor in valores]
+
+
+def _digito(soma):
+    resto = soma % 11
+    return 0 if resto < 2 else 11 - resto
+
+
+def cpf_valido(cpf):
+    """CPF de 11 dígitos (já normalizado) com dígitos verificadores corretos"""
+    if len(cpf) != 11 or cpf == cpf[0] * 11:
+        return False
+    digitos = [ord(c) - 48 for c in cpf]
+    if digitos[9] != _digito(sum(d * p for d, p in zip(digitos, _PESOS1))):
+        return False
+    return digitos[10] == _digito(sum(d * p for d, p in zip(digitos, _PESOS2)))
+
+
+def _validar_numpy(np, cpfs):
+    validos = np.zeros(len(cpfs), dtype=bool)
+    posicoes = [i for i, cpf in enumerate(cpfs) if len(cpf) == 11]
+    if not posicoes:
+        return validos
+    digitos = (np.frombuffer(''.join(cpfs[i] for i in posicoes).encode('ascii'), dtype=np.uint8)
+               .reshape(-1, 11).astype(np.int32) - 48)
+    restos = digitos[:, :9] @ np.array(_PESOS1, dtype=np.int32) % 11
+    digito1 = np.where(restos < 2, 0, 11 - restos)
+    restos = digitos[:, :10] @ np.array(_PESOS2, dtype=np.int32) % 11
+    digito2 = np.where(restos < 2, 0, 11 - restos)
+    repetidos = (digitos == digitos[:, :1]).all(axis=1)
+    validos[posicoes] = (digitos[:, 9] == digito1) & (digitos[:, 10] == digito2) & ~repetidos
+    return validos
+
+
+def validar_cpfs(cpfs, usar_numpy=None):
+    """Validar uma lista de CPFs (com ou sem máscara).
+
+    Retorna (válidos, normalizados): uma lista de bool e os CPFs só com
+    dígitos, na mesma ordem. `usar_numpy=None` decide pelo tamanho do lote.
+    """
+    normalizados = somente_digitos(cpfs)
+    np = numpy() if usar_numpy is not False else None
+    if np is not None and (usar_numpy or len(normalizados) >= LIMIAR_NUMPY):
+        return _validar_numpy(np, normalizados).tolist(), normalizados
+    return [cpf_valido(cpf) for cpf in normalizados], normalizados
+
+
+def formatar_telefone(telefone):
+    """Telefone (já normalizado) no formato (11) 91234-5678 ou (11) 1234-5678"""
+    if len(telefone) == 11:
+        return f"({telefone[:2]}) {telefone[2:7]}-{telefone[7:]}"
+    if len(telefone) == 10:
+        return f"({telefone[:2]}) {telefone[2:6]}-{telefone[6:]}"
+    return telefone
+
+
+def telefone_valido(telefone):
+    """DDD sem zero inicial e 8 dígitos (fixo) ou 9 começando com 9 (celular)"""
+    if len(telefone) == 10:
+        return telefone[0] != '0'
+    return len(telefone) == 11 and telefone[0] != '0' and telefone[2] == '9'
+
+
+def validar_telefones(telefones):
+    """Validar uma lista de telefones.
+
+    Retorna (válidos, formatados); telefones fora do padrão são devolvidos só
+    com os dígitos.
+    """
+    normalizados = somente_digitos(telefones)
+    return [telefone_valido(t) for t in normalizados], [formatar_telefone(t) for t in normalizados]
+
+
+def duplicados(valores):
+    """Valores repetidos (vazios ignorados) com as posições em que aparecem"""
+    posicoes = defaultdict(list)
+    for i, valor in enumerate(valores):
+        if valor:
+            posicoes[valor].append(i)
+    return {valor: lista for valor, lista in posicoes.items() if len(lista) > 1}
+
+
+def auditar(motoristas, usar_numpy=None):
+    """CPFs inválidos ou duplicados e celulares fora do padrão no cadastro"""
+    validos, cpfs = validar_cpfs([m.get('cpf') for m in motoristas], usar_numpy)
+    celulares_validos, _ = validar_telefones([m.get('celular') for m in motoristas])
+
+    def resumo(motorista):
+        return {'id': motorista.get('id'), 'nome': motorista.get('nome'), 'cpf': motorista.get('cpf')}
+
+    return {
+        'total': len(motoristas),
+        'cpfs_invalidos': [resumo(m) for m, valido in zip(motoristas, validos) if not valido],
+        'cpfs_duplicados': {cpf: [resumo(motoristas[i]) for i in posicoes]
+                            for cpf, posicoes in sorted(duplicados(cpfs).items())},
+        'celulares_invalidos': [
+            dict(resumo(m), celular=m.get('celular'))
+            for m, valido in zip(motoristas, celulares_validos) if m.get('celular') and not valido
+        ]
+    }
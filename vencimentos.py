@@ -0,0 +1,121 @@
+import heapq
+import threading
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+
+# Documento -> campo de validade no cadastro do motorista
+DOCUMENTOS = {'cnh': 'validade_cnh', 'curso': 'validade_curso'}
+
+# Dias de antecedência para considerar um documento "vencendo"
+DIAS_AVISO = 30
+
+
+def parse_data(valor):
+    """Converter data no formato AAAA-MM-DD; None se vazia ou inválida"""
+    if not valor:
+        return None
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def classificar(validade, hoje):
+    """Status de um documento: 'vencido', 'vencendo' ou 'ok'"""
+    if validade is None:
+        return 'ok'
+    if validade < hoje:
+        return 'vencido'
+    if validade <= hoje + timedelta(days=DIAS_AVISO):
+        return 'vencendo'
+    return 'ok'
+
+
+class IndiceVencimentos:
+    """Índice de validades ordenado por data.
+
+    As datas são convertidas uma única vez, quando o motorista é gravado; as
+    contagens do painel e os próximos vencimentos saem de buscas binárias nas
+    listas ordenadas de (data, id) de cada documento.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._validades = {}
+        self._ordenado = {doc: [] for doc in DOCUMENTOS}
+
+    @staticmethod
+    def _extrair(motorista):
+        validades = {}
+        for doc, campo in DOCUMENTOS.items():
+            validade = parse_data(motorista.get(campo))
+            if validade:
+                validades[doc] = validade
+        return validades
+
+    def recarregar(self, motoristas):
+        with self._lock:
+            self._validades = {}
+            self._ordenado = {doc: [] for doc in DOCUMENTOS}
+            for motorista in motoristas:
+                validades = self._extrair(motorista)
+                self._validades[motorista['id']] = validades
+                for doc, validade in validades.items():
+                    self._ordenado[doc].append((validade, motorista['id']))
+            for lista in self._ordenado.values():
+                lista.sort()
+
+    def aplicar(self, anterior, novo):
+        with self._lock:
+            if anterior is not None:
+                for doc, validade in self._validades.pop(anterior['id'], {}).items():
+                    lista = self._ordenado[doc]
+                    i = bisect_left(lista, (validade, anterior['id']))
+                    if i < len(lista) and lista[i] == (validade, anterior['id']):
+                        del lista[i]
+            if novo is not None:
+                validades = self._extrair(novo)
+                self._validades[novo['id']] = validades
+                for doc, validade in validades.items():
+                    insort(self._ordenado[doc], (validade, novo['id']))
+
+    def status(self, id, hoje):
+        """Status de cada documento do motorista"""
+        with self._lock:
+            validades = self._validades.get(id, {})
+        return {doc: classificar(validades.get(doc), hoje) for doc in DOCUMENTOS}
+
+    def validades(self, id):
+        """Datas de validade do motorista por documento"""
+        with self._lock:
+            return dict(self._validades.get(id, {}))
+
+    def contar(self, hoje):
+        """Quantidade de documentos vencidos e vencendo em `hoje`"""
+        limite = hoje + timedelta(days=DIAS_AVISO + 1)
+        vencidos = vencendo = 0
+        with self._lock:
+            for lista in self._ordenado.values():
+                inicio = bisect_left(lista, (hoje,))
+                vencidos += inicio
+                vencendo += bisect_left(lista, (limite,)) - inicio
+        return {'documentos_vencidos': vencidos, 'documentos_vencendo': vencendo}
+
+    def entre(self, inicio, fim):
+        """Vencimentos (data, id, documento) com data em [inicio, fim], ordenados"""
+        with self._lock:
+            faixas = []
+            for doc, lista in self._ordenado.items():
+                a = bisect_left(lista, (inicio,))
+                b = bisect_left(lista, (fim + timedelta(days=1),))
+                faixas.append([(validade, id, doc) for validade, id in lista[a:b]])
+        return list(heapq.merge(*faixas))
+
+    def proximos(self, hoje, limite=10):
+        """Os `limite` próximos vencimentos a partir de `hoje`"""
+        with self._lock:
+            faixas = []
+            for doc, lista in self._ordenado.items():
+                a = bisect_left(lista, (hoje,))
+                faixas.append([(validade, id, doc) for validade, id in lista[a:a + limite]])
+        return list(heapq.merge(*faixas))[:limite]